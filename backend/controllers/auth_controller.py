@@ -1,14 +1,46 @@
 from fastapi import HTTPException
 from motor.motor_asyncio import AsyncIOMotorDatabase
-from models.user import UserCreate, UserLogin, UserResponse, UserInDB
-from utils.auth import hash_password, verify_password, create_access_token
+from pymongo import ReturnDocument
+from models.user import UserCreate, UserLogin, UserResponse, UserInDB, SessionInDB
+from utils.auth import (
+    hash_password, verify_password, create_access_token, create_refresh_token,
+    hash_refresh_token, revoke_session, REFRESH_TOKEN_EXPIRE_DAYS, REFRESH_REUSE_GRACE_SECONDS
+)
 import uuid
-from datetime import datetime, timezone
+from datetime import datetime, timezone, timedelta
 
 class AuthController:
     def __init__(self, db: AsyncIOMotorDatabase):
         self.db = db
         self.users_collection = db.users
+        self.sessions_collection = db.sessions
+    
+    async def ensure_indexes(self) -> None:
+        """Create session lookup indexes and the TTL index that expires old sessions"""
+        await self.sessions_collection.create_index("expires_at", expireAfterSeconds=0)
+        await self.sessions_collection.create_index("token_hash", unique=True)
+        await self.sessions_collection.create_index("previous_token_hash")
+    
+    async def _create_session(self, user_id: str, email: str) -> dict:
+        """Start a refresh-token session and return a fresh token pair"""
+        session_id = str(uuid.uuid4())
+        refresh_token = create_refresh_token()
+        
+        session = SessionInDB(
+            id=session_id,
+            user_id=user_id,
+            email=email,
+            token_hash=hash_refresh_token(refresh_token),
+            expires_at=datetime.now(timezone.utc) + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS),
+            created_at=datetime.now(timezone.utc).isoformat()
+        )
+        await self.sessions_collection.insert_one(session.model_dump())
+        
+        return {
+            "access_token": create_access_token({"user_id": user_id, "email": email, "sid": session_id}),
+            "refresh_token": refresh_token,
+            "token_type": "bearer"
+        }
     
     async def signup(self, user_data: UserCreate) -> dict:
         """Register a new user"""
@@ -31,12 +63,11 @@ class AuthController:
         
         await self.users_collection.insert_one(user_in_db.model_dump())
         
-        # Create access token
-        access_token = create_access_token({"user_id": user_id, "email": user_data.email})
+        # Create access and refresh tokens
+        tokens = await self._create_session(user_id, user_data.email)
         
         return {
-            "access_token": access_token,
-            "token_type": "bearer",
+            **tokens,
             "user": UserResponse(
                 id=user_id,
                 email=user_data.email,
@@ -56,12 +87,11 @@ class AuthController:
         if not verify_password(user_data.password, user["hashed_password"]):
             raise HTTPException(status_code=401, detail="Invalid email or password")
         
-        # Create access token
-        access_token = create_access_token({"user_id": user["id"], "email": user["email"]})
+        # Create access and refresh tokens
+        tokens = await self._create_session(user["id"], user["email"])
         
         return {
-            "access_token": access_token,
-            "token_type": "bearer",
+            **tokens,
             "user": UserResponse(
                 id=user["id"],
                 email=user["email"],
@@ -70,6 +100,60 @@ class AuthController:
             )
         }
     
-    async def logout(self) -> dict:
-        """Logout user (client-side token removal)"""
+    async def refresh(self, refresh_token: str) -> dict:
+        """Rotate a refresh token and issue a new access token"""
+        token_hash = hash_refresh_token(refresh_token)
+        new_refresh_token = create_refresh_token()
+        now = datetime.now(timezone.utc)
+        
+        # Swap the hash atomically so a token can only be redeemed once
+        session = await self.sessions_collection.find_one_and_update(
+            {"token_hash": token_hash, "expires_at": {"$gt": now}},
+            {"$set": {
+                "token_hash": hash_refresh_token(new_refresh_token),
+                "previous_token_hash": token_hash,
+                "rotated_at": now,
+                "expires_at": now + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
+            }},
+            return_document=ReturnDocument.AFTER
+        )
+        
+        if not session:
+            # Tabs sharing one token can race to redeem it; a replay just after rotation
+            # gets an access token only, and keeps using the refresh token the winner stored
+            raced = await self.sessions_collection.find_one({
+                "previous_token_hash": token_hash,
+                "rotated_at": {"$gt": now - timedelta(seconds=REFRESH_REUSE_GRACE_SECONDS)},
+                "expires_at": {"$gt": now}
+            })
+            if raced:
+                return {
+                    "access_token": create_access_token({"user_id": raced["user_id"], "email": raced["email"], "sid": raced["id"]}),
+                    "refresh_token": None,
+                    "token_type": "bearer"
+                }
+            
+            # A rotated-out token replayed any later means it leaked - end the whole session
+            reused = await self.sessions_collection.find_one_and_delete({"previous_token_hash": token_hash})
+            if reused:
+                revoke_session(reused["id"])
+            raise HTTPException(status_code=401, detail="Invalid or expired refresh token")
+        
+        access_token = create_access_token({"user_id": session["user_id"], "email": session["email"], "sid": session["id"]})
+        
+        return {
+            "access_token": access_token,
+            "refresh_token": new_refresh_token,
+            "token_type": "bearer"
+        }
+    
+    async def logout(self, refresh_token: str) -> dict:
+        """Logout user by ending their refresh session and revoking its access tokens"""
+        token_hash = hash_refresh_token(refresh_token)
+        # A tab that lost a refresh race still holds the previous token
+        session = await self.sessions_collection.find_one_and_delete(
+            {"$or": [{"token_hash": token_hash}, {"previous_token_hash": token_hash}]}
+        )
+        if session:
+            revoke_session(session["id"])
         return {"message": "Successfully logged out"}
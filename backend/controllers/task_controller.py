@@ -1,13 +1,98 @@
 from fastapi import HTTPException
-from motor.motor_asyncio import AsyncIOMotorDatabase
-from models.task import TaskCreate, TaskUpdate, TaskResponse, TaskInDB, TaskStats
+from motor.motor_asyncio import AsyncIOMotorDatabase, AsyncIOMotorCollection
+from models.task import TaskCreate, TaskUpdate, TaskResponse, TaskInDB, TaskStats, TaskEvent
+from utils.write_coalescer import WriteCoalescer
+from utils.partition_router import PartitionRouter
+from utils.reminder_scheduler import ReminderScheduler
+from utils.activity_log import ActivityLog
+from utils.profiling import span
 from typing import List, Optional
 from datetime import datetime, timezone, timedelta
 
 class TaskController:
-    def __init__(self, db: AsyncIOMotorDatabase):
+    def __init__(
+        self,
+        db: AsyncIOMotorDatabase,
+        write_coalescer: Optional[WriteCoalescer] = None,
+        partition_router: Optional[PartitionRouter] = None,
+        reminder_scheduler: Optional[ReminderScheduler] = None,
+        activity_log: Optional[ActivityLog] = None
+    ):
         self.db = db
         self.tasks_collection = db.tasks
+        self.archive_collection = db.tasks_archive
+        self.write_coalescer = write_coalescer
+        self.partition_router = partition_router
+        self.reminder_scheduler = reminder_scheduler
+        self.activity_log = activity_log
+    
+    def _tasks(self, user_id: str) -> AsyncIOMotorCollection:
+        """Tasks collection for the user's partition"""
+        if self.partition_router:
+            return self.partition_router.database_for(user_id).tasks
+        return self.tasks_collection
+    
+    def _archive(self, user_id: str) -> AsyncIOMotorCollection:
+        """Archived tasks collection for the user's partition"""
+        if self.partition_router:
+            return self.partition_router.database_for(user_id).tasks_archive
+        return self.archive_collection
+    
+    async def _flush_pending_writes(self, user_id: str) -> None:
+        """Flush coalesced writes so reads see this user's own updates"""
+        if self.write_coalescer and self.write_coalescer.has_pending_for_user(user_id):
+            await self.write_coalescer.flush()
+    
+    async def _restore_archived(self, task_id: str, user_id: str) -> Optional[dict]:
+        """Move an archived task back to the live collection so it can be edited"""
+        task = await self._archive(user_id).find_one({"id": task_id, "user_id": user_id})
+        if not task:
+            return None
+        
+        # Write the live copy first so a failure in between never loses the task
+        await self._tasks(user_id).replace_one({"id": task_id}, task, upsert=True)
+        await self._archive(user_id).delete_one({"id": task_id, "user_id": user_id})
+        return task
+    
+    async def _find_task(self, task_id: str, user_id: str) -> dict:
+        """Fetch a task owned by the user, overlaid with any unflushed writes"""
+        with span("query"):
+            task = await self._tasks(user_id).find_one({"id": task_id, "user_id": user_id})
+        if not task:
+            task = await self._restore_archived(task_id, user_id)
+        if not task:
+            raise HTTPException(status_code=404, detail="Task not found")
+        
+        if self.write_coalescer:
+            task.update(self.write_coalescer.pending_for(task_id, user_id) or {})
+        return task
+    
+    async def _apply_update(self, task: dict, update_data: dict, event_type: str = "updated") -> TaskResponse:
+        """Persist a $set on a task, through the write coalescer when enabled"""
+        if self.activity_log:
+            changes = {
+                field: {"from": task.get(field), "to": value}
+                for field, value in update_data.items()
+                if field != "updated_at" and task.get(field) != value
+            }
+            if changes:
+                self.activity_log.record(event_type, task["id"], task["user_id"], changes)
+        
+        if self.write_coalescer:
+            self.write_coalescer.schedule(task["id"], task["user_id"], update_data)
+            task.update(update_data)
+            updated_task = task
+        else:
+            await self._tasks(task["user_id"]).update_one(
+                {"id": task["id"], "user_id": task["user_id"]},
+                {"$set": update_data}
+            )
+            updated_task = await self._tasks(task["user_id"]).find_one({"id": task["id"]})
+        
+        if self.reminder_scheduler:
+            self.reminder_scheduler.track(updated_task)
+        
+        return TaskResponse(**updated_task)
     
     async def create_task(self, task_data: TaskCreate, user_id: str) -> TaskResponse:
         """Create a new task"""
@@ -21,7 +106,13 @@ class TaskController:
             tags=task_data.tags or []
         )
         
-        await self.tasks_collection.insert_one(task_in_db.model_dump())
+        await self._tasks(user_id).insert_one(task_in_db.model_dump())
+        
+        if self.reminder_scheduler:
+            self.reminder_scheduler.track(task_in_db.model_dump())
+        
+        if self.activity_log:
+            self.activity_log.record("created", task_in_db.id, user_id, task_in_db.model_dump(exclude={"id", "user_id"}))
         
         return TaskResponse(**task_in_db.model_dump())
     
@@ -32,9 +123,12 @@ class TaskController:
         sort_by: str = "created_at",
         sort_order: int = -1,
         search: Optional[str] = None,
-        category: Optional[str] = None
+        category: Optional[str] = None,
+        include_archived: bool = False
     ) -> List[TaskResponse]:
         """Get all tasks with server-side filtering and sorting using aggregation"""
+        await self._flush_pending_writes(user_id)
+        
         # Build aggregation pipeline
         pipeline = [
             {"$match": {"user_id": user_id}}
@@ -48,6 +142,15 @@ class TaskController:
         if category:
             pipeline[0]["$match"]["category"] = category
         
+        # Archived tasks are all completed, so skip them when listing pending work
+        if include_archived and completed is not False:
+            pipeline.append({
+                "$unionWith": {
+                    "coll": self._archive(user_id).name,
+                    "pipeline": [{"$match": dict(pipeline[0]["$match"])}]
+                }
+            })
+        
         # Add search filter
         if search:
             pipeline.append({
@@ -84,14 +187,18 @@ class TaskController:
             pipeline.append({"$sort": {sort_by: sort_order}})
         
         # Execute aggregation
-        cursor = self.tasks_collection.aggregate(pipeline)
-        tasks = await cursor.to_list(length=None)
+        with span("query"):
+            cursor = self._tasks(user_id).aggregate(pipeline)
+            tasks = await cursor.to_list(length=None)
         
-        return [TaskResponse(**task) for task in tasks]
+        with span("validate"):
+            return [TaskResponse(**task) for task in tasks]
     
     async def get_task_stats(self, user_id: str) -> TaskStats:
         """Get task statistics"""
-        all_tasks = await self.tasks_collection.find({"user_id": user_id}).to_list(length=None)
+        await self._flush_pending_writes(user_id)
+        with span("query"):
+            all_tasks = await self._tasks(user_id).find({"user_id": user_id}).to_list(length=None)
         
         total = len(all_tasks)
         completed = sum(1 for t in all_tasks if t.get("completed", False))
@@ -128,6 +235,19 @@ class TaskController:
             if cat:
                 categories[cat] = categories.get(cat, 0) + 1
         
+        # Fold in archived tasks (always completed, so only totals and categories change)
+        with span("query"):
+            archived = await self._archive(user_id).aggregate([
+                {"$match": {"user_id": user_id}},
+                {"$group": {"_id": "$category", "count": {"$sum": 1}}}
+            ]).to_list(length=None)
+        
+        for group in archived:
+            total += group["count"]
+            completed += group["count"]
+            if group["_id"]:
+                categories[group["_id"]] = categories.get(group["_id"], 0) + group["count"]
+        
         return TaskStats(
             total=total,
             completed=completed,
@@ -143,42 +263,51 @@ class TaskController:
     async def update_task(self, task_id: str, task_data: TaskUpdate, user_id: str) -> TaskResponse:
         """Update a task"""
         # Check if task exists and belongs to user
-        task = await self.tasks_collection.find_one({"id": task_id, "user_id": user_id})
-        if not task:
-            raise HTTPException(status_code=404, detail="Task not found")
+        task = await self._find_task(task_id, user_id)
         
         # Update fields
         update_data = task_data.model_dump(exclude_unset=True)
         update_data["updated_at"] = datetime.now(timezone.utc).isoformat()
         
-        await self.tasks_collection.update_one(
-            {"id": task_id, "user_id": user_id},
-            {"$set": update_data}
-        )
-        
-        # Fetch updated task
-        updated_task = await self.tasks_collection.find_one({"id": task_id})
-        return TaskResponse(**updated_task)
+        return await self._apply_update(task, update_data)
     
     async def delete_task(self, task_id: str, user_id: str) -> dict:
         """Delete a task"""
-        result = await self.tasks_collection.delete_one({"id": task_id, "user_id": user_id})
+        pending = None
+        if self.write_coalescer:
+            pending = self.write_coalescer.pending_for(task_id, user_id)
+            self.write_coalescer.discard(task_id, user_id)
+        
+        deleted = await self._tasks(user_id).find_one_and_delete({"id": task_id, "user_id": user_id}, {"_id": 0})
+        if not deleted:
+            deleted = await self._archive(user_id).find_one_and_delete({"id": task_id, "user_id": user_id}, {"_id": 0})
         
-        if result.deleted_count == 0:
+        if not deleted:
             raise HTTPException(status_code=404, detail="Task not found")
         
+        if self.reminder_scheduler:
+            self.reminder_scheduler.forget(task_id)
+        
+        if self.activity_log:
+            # Keep a full snapshot so the delete can be undone
+            deleted.update(pending or {})
+            self.activity_log.record("deleted", task_id, user_id, deleted)
+        
         return {"message": "Task deleted successfully"}
     
+    async def get_task_history(self, task_id: str, user_id: str, limit: int = 50, skip: int = 0) -> List[TaskEvent]:
+        """Get a task's activity history, newest first"""
+        if not self.activity_log:
+            raise HTTPException(status_code=404, detail="Task history is not available")
+        
+        return await self.activity_log.get_history(task_id, user_id, limit=limit, skip=skip)
+    
     async def mark_complete(self, task_id: str, user_id: str, completed: bool) -> TaskResponse:
         """Mark task as complete or incomplete"""
-        task = await self.tasks_collection.find_one({"id": task_id, "user_id": user_id})
-        if not task:
-            raise HTTPException(status_code=404, detail="Task not found")
+        task = await self._find_task(task_id, user_id)
         
-        await self.tasks_collection.update_one(
-            {"id": task_id, "user_id": user_id},
-            {"$set": {"completed": completed, "updated_at": datetime.now(timezone.utc).isoformat()}}
+        return await self._apply_update(
+            task,
+            {"completed": completed, "updated_at": datetime.now(timezone.utc).isoformat()},
+            event_type="completed" if completed else "reopened"
         )
-        
-        updated_task = await self.tasks_collection.find_one({"id": task_id})
-        return TaskResponse(**updated_task)
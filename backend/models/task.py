@@ -56,3 +56,18 @@ class TaskStats(BaseModel):
     overdue: int
     due_today: int
     categories: dict
+
+class TaskReminder(BaseModel):
+    task_id: str
+    user_id: str
+    title: str
+    due_date: str
+    fired_at: str
+
+class TaskEvent(BaseModel):
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    task_id: str
+    user_id: str
+    type: Literal["created", "updated", "completed", "reopened", "deleted"]
+    changes: dict = {}
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
@@ -11,6 +11,9 @@ class UserLogin(BaseModel):
     email: EmailStr
     password: str
 
+class RefreshRequest(BaseModel):
+    refresh_token: str
+
 class UserResponse(BaseModel):
     id: str
     email: str
@@ -23,3 +26,13 @@ class UserInDB(BaseModel):
     name: str
     hashed_password: str
     created_at: str
+
+class SessionInDB(BaseModel):
+    id: str
+    user_id: str
+    email: str
+    token_hash: str
+    previous_token_hash: Optional[str] = None
+    rotated_at: Optional[datetime] = None
+    expires_at: datetime
+    created_at: str
@@ -0,0 +1,93 @@
+"""Inspect and move users between task partitions.
+
+Usage:
+    python rebalance_partitions.py show <user_id>
+    python rebalance_partitions.py buckets
+    python rebalance_partitions.py move <user_id> <partition> [--source <partition> | --from-main]
+    python rebalance_partitions.py move-bucket <bucket> <partition>
+    python rebalance_partitions.py adopt-main
+
+Reads MONGO_URL, DB_NAME and TASK_PARTITIONS from backend/.env like the server.
+"""
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+from pathlib import Path
+import argparse
+import asyncio
+import logging
+import os
+import sys
+
+ROOT_DIR = Path(__file__).parent
+sys.path.insert(0, str(ROOT_DIR))
+
+load_dotenv(ROOT_DIR / '.env')
+
+from utils.partition_router import PartitionRouter, PARTITIONED_COLLECTIONS
+
+
+async def main(args: argparse.Namespace) -> None:
+    task_partitions = os.environ.get('TASK_PARTITIONS', '')
+    if not task_partitions:
+        sys.exit("TASK_PARTITIONS is not set")
+
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    main_db = client[os.environ['DB_NAME']]
+    router = PartitionRouter.from_spec(task_partitions, client, main_db)
+    try:
+        await router.load_placement()
+        if args.command == "show":
+            partition = router.partition_for(args.user_id)
+            bucket = router.bucket_for(args.user_id)
+            print(f"user {args.user_id}: partition {partition} (bucket {bucket} -> {router.hash_partition(args.user_id)})")
+            for index, database in enumerate(router.partitions):
+                counts = {name: await database[name].count_documents({"user_id": args.user_id}) for name in PARTITIONED_COLLECTIONS}
+                print(f"  [{index}] {database.name}: {counts}")
+        elif args.command == "buckets":
+            counts = router.bucket_counts()
+            for index, database in enumerate(router.partitions):
+                print(f"  [{index}] {database.name}: {counts.get(index, 0)} buckets")
+        elif args.command == "move":
+            source = main_db if args.from_main else args.source
+            print(await router.move_user(args.user_id, args.partition, source=source))
+        elif args.command == "move-bucket":
+            print(await router.move_bucket(args.bucket, args.partition))
+        else:
+            # Tasks written to DB_NAME before TASK_PARTITIONS was enabled
+            if router.legacy_partition is None:
+                users = await router.users_in(main_db)
+            else:
+                users = {user_id for user_id in await router.users_in(main_db)
+                         if router.partition_for(user_id) != router.legacy_partition}
+            for user_id in sorted(users):
+                print(await router.move_user(user_id, router.partition_for(user_id), source=main_db))
+    finally:
+        router.close()
+        client.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description="Inspect and move users between task partitions")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    show = commands.add_parser("show", help="Show a user's partition and task counts")
+    show.add_argument("user_id")
+
+    commands.add_parser("buckets", help="Show how many buckets each partition holds")
+
+    move = commands.add_parser("move", help="Move a user's tasks to another partition")
+    move.add_argument("user_id")
+    move.add_argument("partition", type=int)
+    source = move.add_mutually_exclusive_group()
+    source.add_argument("--source", type=int, help="Partition to move from (default: the user's current one)")
+    source.add_argument("--from-main", action="store_true", help="Move from DB_NAME (tasks from before partitioning)")
+
+    move_bucket = commands.add_parser("move-bucket", help="Reassign a bucket, moving the users already in it")
+    move_bucket.add_argument("bucket", type=int)
+    move_bucket.add_argument("partition", type=int)
+
+    commands.add_parser("adopt-main", help="Move tasks still in DB_NAME to each user's partition")
+
+    asyncio.run(main(parser.parse_args()))
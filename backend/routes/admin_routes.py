@@ -0,0 +1,23 @@
+from fastapi import APIRouter, Depends
+from fastapi.responses import PlainTextResponse
+from utils.profiling import recent_profiles, get_profile, require_profile_token
+
+def create_admin_routes() -> APIRouter:
+    router = APIRouter(prefix="/admin", tags=["Admin"], dependencies=[Depends(require_profile_token)])
+    
+    @router.get("/profiles", status_code=200)
+    async def list_profiles():
+        """List recently captured request profiles, newest first"""
+        return recent_profiles()
+    
+    @router.get("/profiles/{profile_id}", status_code=200)
+    async def get_profile_detail(profile_id: str):
+        """Get timings and stage spans for a profile"""
+        return get_profile(profile_id).detail()
+    
+    @router.get("/profiles/{profile_id}/flamegraph", response_class=PlainTextResponse, status_code=200)
+    async def get_profile_flamegraph(profile_id: str):
+        """Get sampled stacks in collapsed format for flamegraph.pl or speedscope"""
+        return get_profile(profile_id).collapsed_stacks()
+    
+    return router
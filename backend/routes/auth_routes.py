@@ -1,8 +1,7 @@
-from fastapi import APIRouter, Depends
-from models.user import UserCreate, UserLogin
+from fastapi import APIRouter
+from models.user import UserCreate, UserLogin, RefreshRequest
 from controllers.auth_controller import AuthController
 from motor.motor_asyncio import AsyncIOMotorDatabase
-from utils.auth import get_current_user
 
 def create_auth_routes(db: AsyncIOMotorDatabase) -> APIRouter:
     router = APIRouter(prefix="/auth", tags=["Authentication"])
@@ -18,9 +17,14 @@ def create_auth_routes(db: AsyncIOMotorDatabase) -> APIRouter:
         """User login endpoint"""
         return await auth_controller.signin(user_data)
     
+    @router.post("/refresh", status_code=200)
+    async def refresh(refresh_data: RefreshRequest):
+        """Exchange a refresh token for a new token pair"""
+        return await auth_controller.refresh(refresh_data.refresh_token)
+    
     @router.post("/logout", status_code=200)
-    async def logout(current_user: dict = Depends(get_current_user)):
-        """User logout endpoint"""
-        return await auth_controller.logout()
+    async def logout(refresh_data: RefreshRequest):
+        """User logout endpoint; takes the refresh token so it works after the access token expired"""
+        return await auth_controller.logout(refresh_data.refresh_token)
     
     return router
@@ -1,13 +1,30 @@
-from fastapi import APIRouter, Depends, Query
-from models.task import TaskCreate, TaskUpdate, TaskResponse, TaskStats
+from fastapi import APIRouter, Depends, Query, Request
+from models.task import TaskCreate, TaskUpdate, TaskResponse, TaskStats, TaskEvent
 from controllers.task_controller import TaskController
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from utils.auth import get_current_user
+from utils.encoding import negotiated_response
+from utils.write_coalescer import WriteCoalescer
+from utils.partition_router import PartitionRouter
+from utils.reminder_scheduler import ReminderScheduler
+from utils.activity_log import ActivityLog
 from typing import List, Optional
 
-def create_task_routes(db: AsyncIOMotorDatabase) -> APIRouter:
+def create_task_routes(
+    db: AsyncIOMotorDatabase,
+    write_coalescer: Optional[WriteCoalescer] = None,
+    partition_router: Optional[PartitionRouter] = None,
+    reminder_scheduler: Optional[ReminderScheduler] = None,
+    activity_log: Optional[ActivityLog] = None
+) -> APIRouter:
     router = APIRouter(prefix="/tasks", tags=["Tasks"])
-    task_controller = TaskController(db)
+    task_controller = TaskController(
+        db,
+        write_coalescer=write_coalescer,
+        partition_router=partition_router,
+        reminder_scheduler=reminder_scheduler,
+        activity_log=activity_log
+    )
     
     @router.post("", response_model=TaskResponse, status_code=201)
     async def create_task(
@@ -19,29 +36,35 @@ def create_task_routes(db: AsyncIOMotorDatabase) -> APIRouter:
     
     @router.get("", response_model=List[TaskResponse], status_code=200)
     async def get_all_tasks(
+        request: Request,
         completed: Optional[bool] = Query(None, description="Filter by completion status"),
         sort_by: str = Query("created_at", description="Sort by field (created_at, priority, due_date)"),
         sort_order: int = Query(-1, description="Sort order (1 for ascending, -1 for descending)"),
         search: Optional[str] = Query(None, description="Search in title, description, and tags"),
         category: Optional[str] = Query(None, description="Filter by category"),
+        include_archived: bool = Query(False, description="Include archived completed tasks"),
         current_user: dict = Depends(get_current_user)
     ):
         """Get all tasks with filtering and sorting"""
-        return await task_controller.get_all_tasks(
+        tasks = await task_controller.get_all_tasks(
             current_user["user_id"],
             completed=completed,
             sort_by=sort_by,
             sort_order=sort_order,
             search=search,
-            category=category
+            category=category,
+            include_archived=include_archived
         )
+        return negotiated_response(request, tasks)
     
     @router.get("/stats", response_model=TaskStats, status_code=200)
     async def get_task_stats(
+        request: Request,
         current_user: dict = Depends(get_current_user)
     ):
         """Get task statistics"""
-        return await task_controller.get_task_stats(current_user["user_id"])
+        stats = await task_controller.get_task_stats(current_user["user_id"])
+        return negotiated_response(request, stats)
     
     @router.put("/{task_id}", response_model=TaskResponse, status_code=200)
     async def update_task(
@@ -60,6 +83,16 @@ def create_task_routes(db: AsyncIOMotorDatabase) -> APIRouter:
         """Delete a task"""
         return await task_controller.delete_task(task_id, current_user["user_id"])
     
+    @router.get("/{task_id}/history", response_model=List[TaskEvent], status_code=200)
+    async def get_task_history(
+        task_id: str,
+        limit: int = Query(50, ge=1, le=200, description="Maximum number of events to return"),
+        skip: int = Query(0, ge=0, description="Number of events to skip"),
+        current_user: dict = Depends(get_current_user)
+    ):
+        """Get a task's activity history, newest first"""
+        return await task_controller.get_task_history(task_id, current_user["user_id"], limit=limit, skip=skip)
+    
     @router.patch("/{task_id}/complete", response_model=TaskResponse, status_code=200)
     async def mark_complete(
         task_id: str,
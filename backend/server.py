@@ -18,6 +18,46 @@ mongo_url = os.environ['MONGO_URL']
 client = AsyncIOMotorClient(mongo_url)
 db = client[os.environ['DB_NAME']]
 
+# Optional partitioning of task data across databases (unset keeps everything in DB_NAME)
+from utils.partition_router import PartitionRouter
+task_partitions = os.environ.get('TASK_PARTITIONS', '')
+partition_router = PartitionRouter.from_spec(task_partitions, client, db) if task_partitions else None
+
+# Optional write-behind coalescing of task updates (0 disables)
+from utils.write_coalescer import WriteCoalescer
+write_coalesce_ms = int(os.environ.get('TASK_WRITE_COALESCE_MS', '0'))
+write_coalescer = (
+    WriteCoalescer(db.tasks, window_ms=write_coalesce_ms, partition_router=partition_router)
+    if write_coalesce_ms > 0 else None
+)
+
+# Optional background archiving of long-completed tasks (0 disables)
+from utils.task_archiver import TaskArchiver
+archive_after_days = int(os.environ.get('TASK_ARCHIVE_AFTER_DAYS', '0'))
+task_archiver = (
+    TaskArchiver(
+        db,
+        archive_after_days=archive_after_days,
+        partition_router=partition_router,
+        write_coalescer=write_coalescer
+    )
+    if archive_after_days > 0 else None
+)
+
+# Optional due-date reminders, fired this many minutes before a task is due (unset disables)
+from utils.reminder_scheduler import ReminderScheduler
+from datetime import timedelta
+reminder_lead_minutes = os.environ.get('TASK_REMINDER_LEAD_MINUTES')
+reminder_scheduler = (
+    ReminderScheduler(db, lead_time=timedelta(minutes=int(reminder_lead_minutes)), partition_router=partition_router)
+    if reminder_lead_minutes else None
+)
+
+# Optional buffered per-task activity history, kept this many days (0 disables)
+from utils.activity_log import ActivityLog
+events_retention_days = int(os.environ.get('TASK_EVENTS_RETENTION_DAYS', '0'))
+activity_log = ActivityLog(db, retention_days=events_retention_days) if events_retention_days > 0 else None
+
 # Create the main app
 app = FastAPI(title="TODO Application API")
 
@@ -27,19 +67,55 @@ api_router = APIRouter(prefix="/api")
 # Import routes
 from routes.auth_routes import create_auth_routes
 from routes.task_routes import create_task_routes
+from routes.admin_routes import create_admin_routes
+from controllers.auth_controller import AuthController
+from utils.profiling import profile_requests, ENABLED as PROFILING_ENABLED
 
 # Include routes
 api_router.include_router(create_auth_routes(db))
-api_router.include_router(create_task_routes(db))
+api_router.include_router(create_task_routes(db, write_coalescer, partition_router, reminder_scheduler, activity_log))
+api_router.include_router(create_admin_routes())
 
 # Health check endpoint
 @api_router.get("/")
 async def root():
     return {"message": "TODO API is running", "status": "healthy"}
 
+# Write coalescer metrics
+@api_router.get("/metrics/write-coalescer")
+async def write_coalescer_metrics():
+    if write_coalescer is None:
+        return {"enabled": False}
+    return {"enabled": True, "window_ms": write_coalesce_ms, **write_coalescer.metrics()}
+
+# Task archiver metrics
+@api_router.get("/metrics/archiver")
+async def task_archiver_metrics():
+    if task_archiver is None:
+        return {"enabled": False}
+    return {"enabled": True, **task_archiver.metrics()}
+
+# Reminder scheduler metrics
+@api_router.get("/metrics/reminders")
+async def reminder_scheduler_metrics():
+    if reminder_scheduler is None:
+        return {"enabled": False}
+    return {"enabled": True, **reminder_scheduler.metrics()}
+
+# Activity log metrics
+@api_router.get("/metrics/activity-log")
+async def activity_log_metrics():
+    if activity_log is None:
+        return {"enabled": False}
+    return {"enabled": True, **activity_log.metrics()}
+
 # Include the API router in the main app
 app.include_router(api_router)
 
+# Opt-in request profiling (not installed at all unless configured)
+if PROFILING_ENABLED:
+    app.middleware("http")(profile_requests)
+
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -56,6 +132,32 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+@app.on_event("startup")
+async def start_background_jobs():
+    await AuthController(db).ensure_indexes()
+    if activity_log is not None:
+        await activity_log.ensure_indexes()
+        activity_log.start()
+    if partition_router is not None:
+        await partition_router.ensure_indexes()
+        await partition_router.load_placement()
+        partition_router.start()
+    if task_archiver is not None:
+        task_archiver.start()
+    if reminder_scheduler is not None:
+        reminder_scheduler.start()
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    if task_archiver is not None:
+        await task_archiver.stop()
+    if reminder_scheduler is not None:
+        await reminder_scheduler.stop()
+    if write_coalescer is not None:
+        await write_coalescer.close()
+    if activity_log is not None:
+        await activity_log.stop()
+    if partition_router is not None:
+        await partition_router.stop()
+        partition_router.close()
     client.close()
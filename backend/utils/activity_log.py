@@ -0,0 +1,162 @@
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo.errors import OperationFailure
+from models.task import TaskEvent
+from typing import List, Optional
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+# MongoDB error code for an existing index with the same keys but different options
+INDEX_OPTIONS_CONFLICT = 85
+
+
+class ActivityLog:
+    """Buffered, asynchronous writer for per-task history in `task_events`.
+
+    Write paths call record(), which only enqueues. A background writer
+    drains the queue with insert_many once `batch_size` events are waiting
+    or `flush_interval` seconds have passed, so history can lag writes by
+    up to that interval.
+
+    Backpressure: the queue holds at most `max_queue` events. When it is
+    full, record() drops the event and counts it in `dropped` rather than
+    slowing down the request. stop() drains everything still queued, giving
+    up (and logging how many events were lost) after a timeout.
+    Events live in the main database (not partitioned) and expire after
+    `retention_days` via a TTL index.
+    """
+
+    def __init__(
+        self,
+        db: AsyncIOMotorDatabase,
+        max_queue: int = 10000,
+        batch_size: int = 500,
+        flush_interval: float = 1.0,
+        retention_days: int = 90
+    ):
+        self.events_collection = db.task_events
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.retention_days = retention_days
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self._task: Optional[asyncio.Task] = None
+        self._writing = 0
+
+        self.recorded = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+
+    async def ensure_indexes(self) -> None:
+        ttl = self.retention_days * 24 * 3600
+        try:
+            await self.events_collection.create_index("created_at", expireAfterSeconds=ttl)
+        except OperationFailure as error:
+            if error.code != INDEX_OPTIONS_CONFLICT:
+                raise
+            # The TTL index exists with an older retention; change it in place
+            await self.events_collection.database.command(
+                "collMod", self.events_collection.name,
+                index={"keyPattern": {"created_at": 1}, "expireAfterSeconds": ttl}
+            )
+        await self.events_collection.create_index([("task_id", 1), ("user_id", 1), ("created_at", -1)])
+
+    def record(self, event_type: str, task_id: str, user_id: str, changes: Optional[dict] = None) -> None:
+        """Queue an event without waiting; drops it if the queue is full"""
+        event = TaskEvent(task_id=task_id, user_id=user_id, type=event_type, changes=changes or {})
+        try:
+            self._queue.put_nowait(event.model_dump())
+            self.recorded += 1
+        except asyncio.QueueFull:
+            self.dropped += 1
+            if self.dropped == 1 or self.dropped % 1000 == 0:
+                logger.warning("Activity log queue full, %d events dropped so far", self.dropped)
+
+    async def _write(self, batch: List[dict]) -> None:
+        self._writing = len(batch)
+        try:
+            await self.events_collection.insert_many(batch, ordered=False)
+            self.written += len(batch)
+        except Exception:
+            self.failed += len(batch)
+            logger.exception("Failed to write %d task events", len(batch))
+        # Left set if the write is cancelled, so stop() can count the batch as lost
+        self._writing = 0
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            event = await self._queue.get()
+            if event is None:
+                break
+
+            batch = [event]
+            deadline = loop.time() + self.flush_interval
+            closing = False
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    event = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if event is None:
+                    closing = True
+                    break
+                batch.append(event)
+
+            await self._write(batch)
+            if closing:
+                break
+
+        # Drain whatever was queued behind the stop signal
+        remaining = []
+        while not self._queue.empty():
+            event = self._queue.get_nowait()
+            if event is not None:
+                remaining.append(event)
+        for start in range(0, len(remaining), self.batch_size):
+            await self._write(remaining[start:start + self.batch_size])
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def _drain(self) -> None:
+        await self._queue.put(None)
+        await self._task
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        """Signal the writer to finish and wait up to `timeout` seconds for the queue to drain"""
+        if self._task is None or self._task.done():
+            return
+        try:
+            await asyncio.wait_for(self._drain(), timeout)
+        except asyncio.TimeoutError:
+            # wait_for has cancelled the writer; the batch it was writing and the rest of the queue are lost
+            lost = self._writing
+            while not self._queue.empty():
+                if self._queue.get_nowait() is not None:
+                    lost += 1
+            self.dropped += lost
+            logger.error("Activity log did not drain within %gs, dropping %d queued events", timeout, lost)
+
+    async def get_history(self, task_id: str, user_id: str, limit: int = 50, skip: int = 0) -> List[TaskEvent]:
+        """Get a task's events, newest first"""
+        cursor = self.events_collection.find(
+            {"task_id": task_id, "user_id": user_id},
+            {"_id": 0}
+        ).sort([("created_at", -1), ("_id", -1)]).skip(skip).limit(limit)
+        events = await cursor.to_list(length=limit)
+        return [TaskEvent(**event) for event in events]
+
+    def metrics(self) -> dict:
+        return {
+            "queued": self._queue.qsize(),
+            "recorded": self.recorded,
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed": self.failed,
+        }
@@ -3,6 +3,11 @@ from jose import JWTError, jwt
 from datetime import datetime, timedelta, timezone
 from fastapi import HTTPException, Security
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from utils.profiling import span
+from typing import Dict
+import hashlib
+import secrets
+import time
 import os
 
 # Password hashing
@@ -11,7 +16,10 @@ pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 # JWT settings
 SECRET_KEY = os.environ.get("JWT_SECRET_KEY", "your-secret-key-change-in-production")
 ALGORITHM = "HS256"
-ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24  # 24 hours
+ACCESS_TOKEN_EXPIRE_MINUTES = 15
+REFRESH_TOKEN_EXPIRE_DAYS = 30
+# How long a just-rotated refresh token may still be redeemed by a racing client
+REFRESH_REUSE_GRACE_SECONDS = 30
 
 security = HTTPBearer()
 
@@ -31,6 +39,34 @@ def create_access_token(data: dict) -> str:
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+def create_refresh_token() -> str:
+    """Create an opaque refresh token"""
+    return secrets.token_urlsafe(32)
+
+def hash_refresh_token(token: str) -> str:
+    """Hash a refresh token for storage and lookup (tokens are random, so no salt is needed)"""
+    return hashlib.sha256(token.encode()).hexdigest()
+
+# Sessions logged out in this process, mapped to when their last access token expires.
+# Access tokens are short-lived, so entries only need to outlive ACCESS_TOKEN_EXPIRE_MINUTES.
+# This set is per process: with several workers or replicas, a logged-out session's access
+# tokens stay valid on the others until they expire (at most ACCESS_TOKEN_EXPIRE_MINUTES).
+_revoked_sessions: Dict[str, float] = {}
+
+def revoke_session(session_id: str) -> None:
+    """Reject access tokens for a session until they would have expired anyway"""
+    _revoked_sessions[session_id] = time.time() + ACCESS_TOKEN_EXPIRE_MINUTES * 60
+
+def is_session_revoked(session_id: str) -> bool:
+    """Check the in-memory revocation set, pruning entries that have expired"""
+    expires_at = _revoked_sessions.get(session_id)
+    if expires_at is None:
+        return False
+    if expires_at < time.time():
+        del _revoked_sessions[session_id]
+        return False
+    return True
+
 def decode_token(token: str) -> dict:
     """Decode and verify JWT token"""
     try:
@@ -42,8 +78,12 @@ def decode_token(token: str) -> dict:
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Security(security)) -> dict:
     """Dependency to get current user from JWT token"""
     token = credentials.credentials
-    payload = decode_token(token)
+    with span("auth"):
+        payload = decode_token(token)
     user_id = payload.get("user_id")
     if user_id is None:
         raise HTTPException(status_code=401, detail="Invalid authentication credentials")
-    return {"user_id": user_id, "email": payload.get("email")}
+    session_id = payload.get("sid")
+    if session_id and is_session_revoked(session_id):
+        raise HTTPException(status_code=401, detail="Invalid or expired token")
+    return {"user_id": user_id, "email": payload.get("email"), "session_id": session_id}
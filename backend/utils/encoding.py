@@ -0,0 +1,169 @@
+from fastapi import Request
+from fastapi.encoders import jsonable_encoder
+from starlette.responses import Response, StreamingResponse
+from typing import Any, Iterator, Optional, Tuple
+from utils.profiling import span
+import json
+import zlib
+
+# Optional encoders - negotiation silently skips any that are not installed
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+JSON_MEDIA_TYPE = "application/json"
+
+# Bodies smaller than this are sent uncompressed (headers would outweigh savings)
+MIN_COMPRESS_SIZE = 1024
+# Bodies larger than this are compressed chunk by chunk into a streaming response
+STREAM_THRESHOLD = 256 * 1024
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# Server preference when the client weights several encodings equally
+ENCODING_PREFERENCE = [
+    encoding for encoding, available in (
+        ("zstd", zstandard is not None),
+        ("br", brotli is not None),
+        ("gzip", True),
+    ) if available
+]
+
+
+def _parse_header(value: str) -> dict:
+    """Parse an Accept/Accept-Encoding header into {token: q}"""
+    weights = {}
+    for part in value.split(","):
+        params = part.strip().split(";")
+        token = params[0].strip().lower()
+        if not token:
+            continue
+        q = 1.0
+        for param in params[1:]:
+            key, _, val = param.strip().partition("=")
+            if key.strip() == "q":
+                try:
+                    q = float(val)
+                except ValueError:
+                    q = 0.0
+        weights[token] = q
+    return weights
+
+
+def choose_media_type(accept: Optional[str]) -> str:
+    """Pick MessagePack only when the client explicitly prefers it over JSON"""
+    if not accept or msgpack is None:
+        return JSON_MEDIA_TYPE
+
+    weights = _parse_header(accept)
+    msgpack_q = max(weights.get(MSGPACK_MEDIA_TYPE, 0.0), weights.get("application/x-msgpack", 0.0))
+    json_q = max(weights.get(JSON_MEDIA_TYPE, 0.0), weights.get("*/*", 0.0), weights.get("application/*", 0.0))
+
+    if msgpack_q > json_q:
+        return MSGPACK_MEDIA_TYPE
+    return JSON_MEDIA_TYPE
+
+
+def choose_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """Pick the best content coding the client accepts, or None for identity"""
+    if not accept_encoding:
+        return None
+
+    weights = _parse_header(accept_encoding)
+    wildcard = weights.get("*", 0.0)
+
+    best = None
+    best_q = 0.0
+    for encoding in ENCODING_PREFERENCE:
+        q = weights.get(encoding, wildcard)
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def serialize(content: Any, media_type: str) -> bytes:
+    """Serialize response content as compact JSON or MessagePack"""
+    data = jsonable_encoder(content)
+    if media_type == MSGPACK_MEDIA_TYPE:
+        return msgpack.packb(data, use_bin_type=True)
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _compressor(encoding: str) -> Tuple[Any, Any]:
+    """Return (compress, flush) callables for an incremental compressor"""
+    if encoding == "br":
+        compressor = brotli.Compressor(quality=4)
+        return compressor.process, compressor.finish
+    if encoding == "zstd":
+        compressor = zstandard.ZstdCompressor(level=3).compressobj()
+        return compressor.compress, compressor.flush
+    # wbits=31 produces a gzip container
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    return compressor.compress, compressor.flush
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    """Compress a complete body in one shot"""
+    compress_chunk, flush = _compressor(encoding)
+    return compress_chunk(body) + flush()
+
+
+def compress_stream(body: bytes, encoding: str, chunk_size: int = STREAM_CHUNK_SIZE) -> Iterator[bytes]:
+    """Compress a body incrementally, yielding compressed chunks as they are produced.
+
+    The body is already fully serialized in memory, so this does not reduce peak
+    memory; it lets the first bytes go out before the whole payload is compressed.
+    """
+    compress_chunk, flush = _compressor(encoding)
+    view = memoryview(body)
+    for start in range(0, len(body), chunk_size):
+        chunk = compress_chunk(bytes(view[start:start + chunk_size]))
+        if chunk:
+            yield chunk
+    tail = flush()
+    if tail:
+        yield tail
+
+
+def negotiated_response(request: Request, content: Any, status_code: int = 200) -> Response:
+    """Build a response honouring the request's Accept and Accept-Encoding headers"""
+    media_type = choose_media_type(request.headers.get("accept"))
+    with span("serialize"):
+        body = serialize(content, media_type)
+    headers = {"Vary": "Accept, Accept-Encoding"}
+
+    encoding = None
+    if len(body) >= MIN_COMPRESS_SIZE:
+        encoding = choose_encoding(request.headers.get("accept-encoding"))
+
+    if encoding is None:
+        return Response(content=body, status_code=status_code, media_type=media_type, headers=headers)
+
+    headers["Content-Encoding"] = encoding
+    if len(body) >= STREAM_THRESHOLD:
+        return StreamingResponse(
+            compress_stream(body, encoding),
+            status_code=status_code,
+            media_type=media_type,
+            headers=headers
+        )
+
+    with span("compress"):
+        body = compress(body, encoding)
+    return Response(
+        content=body,
+        status_code=status_code,
+        media_type=media_type,
+        headers=headers
+    )
@@ -0,0 +1,348 @@
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+from pymongo import ReplaceOne
+from pymongo.errors import DuplicateKeyError
+from typing import Dict, List, Optional, Set, Tuple, Union
+from datetime import datetime, timezone
+import asyncio
+import hashlib
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Per-user collections that live in the user's partition
+PARTITIONED_COLLECTIONS = ["tasks", "tasks_archive"]
+
+# Users hash into a fixed number of buckets; a persisted table maps each bucket to a partition
+NUM_BUCKETS = 1024
+BUCKET_TABLE_ID = "buckets"
+
+
+def same_database(a: AsyncIOMotorDatabase, b: AsyncIOMotorDatabase) -> bool:
+    return a.name == b.name and a.client is b.client
+
+
+class PartitionRouter:
+    """Maps a user_id to the database holding that user's tasks.
+
+    A user's id hashes to one of NUM_BUCKETS fixed buckets, and the
+    `partition_buckets` table (created on first start, then only changed by
+    move_bucket) says which partition holds each bucket. Adding partitions
+    therefore moves nobody; data moves only through move_user/move_bucket.
+    The `partition_overrides` collection pins single users elsewhere. Both
+    are cached in memory and reloaded every `refresh_interval` seconds once
+    started, so that moves made by another process are picked up.
+    """
+
+    def __init__(
+        self,
+        partitions: List[AsyncIOMotorDatabase],
+        meta_db: AsyncIOMotorDatabase,
+        refresh_interval: float = 10,
+        clients: Optional[List[AsyncIOMotorClient]] = None
+    ):
+        if not partitions:
+            raise ValueError("At least one partition is required")
+        self.partitions = partitions
+        self.meta_db = meta_db
+        self.overrides_collection = meta_db.partition_overrides
+        self.buckets_collection = meta_db.partition_buckets
+        self.refresh_interval = refresh_interval
+        self._overrides: Dict[str, int] = {}
+        self._buckets: Optional[List[int]] = None
+        self._refresh_task: Optional[asyncio.Task] = None
+        self._clients = clients or []
+
+    @classmethod
+    def from_spec(cls, spec: str, default_client: AsyncIOMotorClient, meta_db: AsyncIOMotorDatabase) -> "PartitionRouter":
+        """Build a router from a `;`-separated list of `db_name` or `mongo_url|db_name` entries"""
+        clients: Dict[str, AsyncIOMotorClient] = {}
+        partitions = []
+        for entry in filter(None, (part.strip() for part in spec.split(";"))):
+            url, _, db_name = entry.rpartition("|")
+            if url:
+                if url not in clients:
+                    clients[url] = AsyncIOMotorClient(url)
+                partitions.append(clients[url][db_name])
+            else:
+                partitions.append(default_client[db_name])
+        return cls(partitions, meta_db, clients=list(clients.values()))
+
+    @property
+    def legacy_partition(self) -> Optional[int]:
+        """Index of the partition that is the main database, where pre-partitioning data lives"""
+        for index, database in enumerate(self.partitions):
+            if same_database(database, self.meta_db):
+                return index
+        return None
+
+    def bucket_for(self, user_id: str) -> int:
+        digest = hashlib.md5(user_id.encode()).digest()
+        return int.from_bytes(digest[:8], "big") % NUM_BUCKETS
+
+    def hash_partition(self, user_id: str) -> int:
+        """The partition the user's bucket maps to, ignoring overrides"""
+        if self._buckets is None:
+            raise RuntimeError("Partition placement has not been loaded")
+        return self._buckets[self.bucket_for(user_id)]
+
+    def bucket_counts(self) -> Dict[int, int]:
+        counts: Dict[int, int] = {}
+        for partition in self._buckets or []:
+            counts[partition] = counts.get(partition, 0) + 1
+        return counts
+
+    def partition_for(self, user_id: str) -> int:
+        override = self._overrides.get(user_id)
+        return override if override is not None else self.hash_partition(user_id)
+
+    def database_for(self, user_id: str) -> AsyncIOMotorDatabase:
+        return self.partitions[self.partition_for(user_id)]
+
+    async def _load_buckets(self) -> List[int]:
+        table = await self.buckets_collection.find_one({"_id": BUCKET_TABLE_ID})
+        if table is None:
+            # First start: keep everyone on the main database if it is a partition, so
+            # existing tasks stay where they are; otherwise spread buckets evenly
+            legacy = self.legacy_partition
+            initial = [legacy if legacy is not None else bucket % len(self.partitions) for bucket in range(NUM_BUCKETS)]
+            try:
+                await self.buckets_collection.update_one(
+                    {"_id": BUCKET_TABLE_ID},
+                    {"$setOnInsert": {"partitions": initial, "updated_at": datetime.now(timezone.utc).isoformat()}},
+                    upsert=True
+                )
+            except DuplicateKeyError:
+                pass  # another process created it first
+            table = await self.buckets_collection.find_one({"_id": BUCKET_TABLE_ID})
+        return table["partitions"]
+
+    async def load_placement(self) -> None:
+        """Reload the bucket table and overrides, refusing any that name a missing partition"""
+        buckets = await self._load_buckets()
+        overrides = await self.overrides_collection.find({}, {"_id": 0}).to_list(length=None)
+        overrides = {override["user_id"]: override["partition"] for override in overrides}
+
+        missing = {partition for partition in [*buckets, *overrides.values()] if not 0 <= partition < len(self.partitions)}
+        if missing:
+            # Routing those users anywhere else would hide their tasks
+            raise ValueError(
+                f"Partitions {sorted(missing)} hold users but only {len(self.partitions)} are configured; "
+                "restore TASK_PARTITIONS or move the users off first"
+            )
+        self._buckets = buckets
+        self._overrides = overrides
+
+    async def _refresh_forever(self) -> None:
+        while True:
+            try:
+                await self.load_placement()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Failed to reload partition placement")
+            await asyncio.sleep(self.refresh_interval)
+
+    def start(self) -> None:
+        """Keep the placement cache fresh in the background"""
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self._refresh_forever())
+
+    async def stop(self) -> None:
+        if self._refresh_task is not None and not self._refresh_task.done():
+            self._refresh_task.cancel()
+            try:
+                await self._refresh_task
+            except asyncio.CancelledError:
+                pass
+
+    async def set_override(self, user_id: str, partition: int) -> None:
+        if not 0 <= partition < len(self.partitions):
+            raise ValueError(f"Partition {partition} does not exist")
+        await self.overrides_collection.update_one(
+            {"user_id": user_id},
+            {"$set": {"partition": partition, "updated_at": datetime.now(timezone.utc).isoformat()}},
+            upsert=True
+        )
+        self._overrides[user_id] = partition
+
+    async def clear_override(self, user_id: str) -> None:
+        await self.overrides_collection.delete_one({"user_id": user_id})
+        self._overrides.pop(user_id, None)
+
+    async def set_bucket(self, bucket: int, partition: int) -> None:
+        if not 0 <= partition < len(self.partitions):
+            raise ValueError(f"Partition {partition} does not exist")
+        await self.buckets_collection.update_one(
+            {"_id": BUCKET_TABLE_ID},
+            {"$set": {f"partitions.{bucket}": partition, "updated_at": datetime.now(timezone.utc).isoformat()}}
+        )
+        self._buckets[bucket] = partition
+
+    async def ensure_indexes(self) -> None:
+        await self.overrides_collection.create_index("user_id", unique=True)
+        for database in self.partitions:
+            await database.tasks.create_index([("user_id", 1), ("id", 1)])
+
+    async def users_in(self, database: AsyncIOMotorDatabase) -> Set[str]:
+        """Every user with tasks (live or archived) in a database"""
+        users = set()
+        for name in PARTITIONED_COLLECTIONS:
+            users.update(await database[name].distinct("user_id"))
+        return users
+
+    async def move_bucket(self, bucket: int, target: int, batch_size: int = 500) -> dict:
+        """Reassign a bucket to another partition and move the users already in it.
+
+        Existing users are first pinned to the old partition so the flip does not
+        hide their tasks; anyone who signed up in the bucket while it was being
+        flipped is swept up afterwards. Each user is then moved with move_user.
+        """
+        await self.load_placement()
+        if not 0 <= bucket < NUM_BUCKETS:
+            raise ValueError(f"Bucket {bucket} does not exist")
+        source = self._buckets[bucket]
+        if source == target:
+            return {"bucket": bucket, "source": source, "target": target, "users": 0}
+        source_db = self.partitions[source]
+
+        def unpinned_bucket_users(users: Set[str]) -> List[str]:
+            return [user for user in users if self.bucket_for(user) == bucket and user not in self._overrides]
+
+        for user_id in unpinned_bucket_users(await self.users_in(source_db)):
+            await self.set_override(user_id, source)
+
+        await self.set_bucket(bucket, target)
+        await asyncio.sleep(self.refresh_interval * 2)
+
+        # Users created on the source between the scan and the flip
+        await self.load_placement()
+        for user_id in unpinned_bucket_users(await self.users_in(source_db)):
+            await self.move_user(user_id, target, batch_size, source=source)
+
+        users = [user_id for user_id, partition in self._overrides.items()
+                 if partition == source and self.bucket_for(user_id) == bucket]
+        for user_id in users:
+            await self.move_user(user_id, target, batch_size)
+
+        logger.info("Moved bucket %d from partition %d to %d (%d users)", bucket, source, target, len(users))
+        return {"bucket": bucket, "source": source, "target": target, "users": len(users)}
+
+    async def move_user(
+        self,
+        user_id: str,
+        target: int,
+        batch_size: int = 500,
+        source: Union[int, AsyncIOMotorDatabase, None] = None
+    ) -> dict:
+        """Move a user's tasks to another partition while the API keeps serving.
+
+        The source defaults to the user's current partition; pass a partition
+        index or a database (e.g. the main database, for tasks written before
+        partitioning was enabled) to collect tasks from somewhere else.
+
+        Tasks are bulk-copied, the override is flipped, and after every router
+        has had time to reload overrides, anything written to the source in the
+        meantime is copied again before the source copy is removed. The catch-up
+        never overwrites a newer edit made on the target after the flip, nor
+        brings back a task that was deleted there. The override is dropped again
+        when the user's bucket already maps to the target.
+        """
+        await self.load_placement()
+        if not 0 <= target < len(self.partitions):
+            raise ValueError(f"Partition {target} does not exist")
+        if source is None:
+            source = self.partition_for(user_id)
+        source_db = self.partitions[source] if isinstance(source, int) else source
+        source_name = source if isinstance(source, int) else source.name
+        target_db = self.partitions[target]
+        if same_database(source_db, target_db):
+            return {"user_id": user_id, "source": source_name, "target": target, "moved": {}}
+        copied: Dict[str, str] = {}
+        for name in PARTITIONED_COLLECTIONS:
+            copied.update(await self._copy(source_db[name], target_db[name], {"user_id": user_id}, batch_size))
+
+        await self.set_override(user_id, target)
+        # Wait out a full reload cycle (plus in-flight requests) in every other process
+        await asyncio.sleep(self.refresh_interval * 2)
+
+        await self._catch_up(user_id, source_db, target_db, copied)
+
+        moved = {}
+        for name in PARTITIONED_COLLECTIONS:
+            result = await source_db[name].delete_many({"user_id": user_id})
+            moved[name] = result.deleted_count
+
+        if self.hash_partition(user_id) == target:
+            await self.clear_override(user_id)
+
+        logger.info("Moved user %s from %s to partition %d: %s", user_id, source_name, target, moved)
+        return {"user_id": user_id, "source": source_name, "target": target, "moved": moved}
+
+    async def _versions(self, database: AsyncIOMotorDatabase, user_id: str) -> Dict[str, Tuple[str, str]]:
+        """Map each of a user's task ids to (collection, updated_at) across live and archive"""
+        versions: Dict[str, Tuple[str, str]] = {}
+        for name in PARTITIONED_COLLECTIONS:
+            async for document in database[name].find({"user_id": user_id}, {"_id": 0, "id": 1, "updated_at": 1}):
+                # A task caught mid-restore is in both collections; the live copy wins
+                versions.setdefault(document["id"], (name, document.get("updated_at", "")))
+        return versions
+
+    async def _catch_up(
+        self,
+        user_id: str,
+        source_db: AsyncIOMotorDatabase,
+        target_db: AsyncIOMotorDatabase,
+        copied: Dict[str, str]
+    ) -> None:
+        """Bring the target up to date with source writes made since the initial copy.
+
+        Tasks are compared by id across both collections, because archiving moves
+        a task between them without touching `updated_at`. The target keeps any
+        task it changed or deleted after the flip.
+        """
+        source_versions = await self._versions(source_db, user_id)
+        target_versions = await self._versions(target_db, user_id)
+
+        for task_id, (name, updated_at) in source_versions.items():
+            current = target_versions.get(task_id)
+            if current is None:
+                if task_id in copied:
+                    continue  # deleted on the target since the flip
+            elif current[1] > updated_at or current == (name, updated_at):
+                continue  # already current, or edited on the target since
+            document = await source_db[name].find_one({"id": task_id, "user_id": user_id})
+            if document is None:
+                continue
+
+            if current is None:
+                await target_db[name].replace_one({"id": task_id}, document, upsert=True)
+            elif current[0] == name:
+                # Only replace the version we compared against, never a concurrent edit
+                await target_db[name].replace_one({"id": task_id, "updated_at": current[1]}, document)
+            else:
+                # Archived (or restored) on the source: move the target copy across too
+                await target_db[name].replace_one({"id": task_id}, document, upsert=True)
+                await target_db[current[0]].delete_one({"id": task_id, "updated_at": current[1]})
+
+        # Tasks deleted from the source meanwhile, unless the target has changed them since
+        for task_id, (name, updated_at) in target_versions.items():
+            if task_id in copied and task_id not in source_versions and copied[task_id] == updated_at:
+                await target_db[name].delete_one({"id": task_id, "updated_at": updated_at})
+
+    async def _copy(self, source, target, query: dict, batch_size: int) -> Dict[str, str]:
+        """Upsert matching documents from source into target, returning {id: updated_at}"""
+        copied = {}
+        batch = []
+        async for document in source.find(query):
+            batch.append(ReplaceOne({"id": document["id"]}, document, upsert=True))
+            copied[document["id"]] = document.get("updated_at", "")
+            if len(batch) >= batch_size:
+                await target.bulk_write(batch, ordered=False)
+                batch = []
+        if batch:
+            await target.bulk_write(batch, ordered=False)
+        return copied
+
+    def close(self) -> None:
+        for client in self._clients:
+            client.close()
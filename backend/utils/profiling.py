@@ -0,0 +1,189 @@
+from fastapi import Header, HTTPException, Request
+from collections import Counter, deque
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Deque, List, Optional
+import logging
+import os
+import random
+import secrets
+import sys
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+# Profiling is opt-in: a request is profiled when it carries `X-Profile: <PROFILE_TOKEN>`
+# or is picked by PROFILE_SAMPLE_RATE (0.0 - 1.0). PROFILE_TOKEN is required either way,
+# since it also guards the admin endpoints that read profiles back. Without it the
+# middleware is not installed and each span costs one context-variable lookup.
+PROFILE_TOKEN = os.environ.get("PROFILE_TOKEN")
+PROFILE_SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_HEADER = "x-profile"
+SAMPLE_INTERVAL = 0.005
+MAX_PROFILES = 50
+
+ENABLED = bool(PROFILE_TOKEN)
+
+if PROFILE_SAMPLE_RATE > 0 and not PROFILE_TOKEN:
+    logger.warning("PROFILE_SAMPLE_RATE is set without PROFILE_TOKEN; profiling stays disabled")
+
+
+class RequestProfile:
+    """Wall/CPU timings, stage spans and stack samples for one request.
+
+    CPU times come from the event-loop thread, so they include any other
+    coroutines that ran while this request was awaiting.
+    """
+
+    def __init__(self, method: str, path: str):
+        self.id = str(uuid.uuid4())
+        self.method = method
+        self.path = path
+        self.started_at = datetime.now(timezone.utc).isoformat()
+        self.status_code: Optional[int] = None
+        self.wall_ms = 0.0
+        self.cpu_ms = 0.0
+        self.spans: List[dict] = []
+        self.stacks: Counter = Counter()
+        self._wall_start = time.perf_counter()
+        self._cpu_start = time.thread_time()
+
+    def finish(self, status_code: int) -> None:
+        self.status_code = status_code
+        self.wall_ms = (time.perf_counter() - self._wall_start) * 1000
+        self.cpu_ms = (time.thread_time() - self._cpu_start) * 1000
+
+    def summary(self) -> dict:
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "started_at": self.started_at,
+            "status_code": self.status_code,
+            "wall_ms": round(self.wall_ms, 3),
+            "cpu_ms": round(self.cpu_ms, 3),
+            "samples": sum(self.stacks.values()),
+        }
+
+    def detail(self) -> dict:
+        return {**self.summary(), "spans": self.spans}
+
+    def collapsed_stacks(self) -> str:
+        """Stacks in the collapsed `frame;frame;frame count` format used by flamegraph tools"""
+        return "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common())
+
+
+class _Span:
+    __slots__ = ("profile", "name", "wall_start", "cpu_start")
+
+    def __init__(self, profile: RequestProfile, name: str):
+        self.profile = profile
+        self.name = name
+
+    def __enter__(self):
+        self.wall_start = time.perf_counter()
+        self.cpu_start = time.thread_time()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.profile.spans.append({
+            "name": self.name,
+            "offset_ms": round((self.wall_start - self.profile._wall_start) * 1000, 3),
+            "wall_ms": round((time.perf_counter() - self.wall_start) * 1000, 3),
+            "cpu_ms": round((time.thread_time() - self.cpu_start) * 1000, 3),
+        })
+        return False
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+_current_profile: ContextVar[Optional[RequestProfile]] = ContextVar("current_profile", default=None)
+_profiles: Deque[RequestProfile] = deque(maxlen=MAX_PROFILES)
+
+
+def span(name: str):
+    """Time a stage of the current request; a shared no-op when it is not being profiled"""
+    profile = _current_profile.get()
+    if profile is None:
+        return _NULL_SPAN
+    return _Span(profile, name)
+
+
+class _StackSampler(threading.Thread):
+    """Samples the event-loop thread's Python stack into a profile until stopped"""
+
+    def __init__(self, profile: RequestProfile, thread_id: int):
+        super().__init__(daemon=True)
+        self.profile = profile
+        self.thread_id = thread_id
+        self.stopped = threading.Event()
+
+    def run(self) -> None:
+        while not self.stopped.wait(SAMPLE_INTERVAL):
+            frame = sys._current_frames().get(self.thread_id)
+            frames = []
+            while frame is not None:
+                code = frame.f_code
+                frames.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            if frames:
+                self.profile.stacks[";".join(reversed(frames))] += 1
+
+
+def _should_profile(request: Request) -> bool:
+    header = request.headers.get(PROFILE_HEADER)
+    if PROFILE_TOKEN and header and secrets.compare_digest(header, PROFILE_TOKEN):
+        return True
+    return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+
+async def profile_requests(request: Request, call_next):
+    """HTTP middleware that profiles opted-in requests end to end"""
+    if not ENABLED or not _should_profile(request):
+        return await call_next(request)
+
+    profile = RequestProfile(request.method, request.url.path)
+    sampler = _StackSampler(profile, threading.get_ident())
+    token = _current_profile.set(profile)
+    sampler.start()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        response.headers["X-Profile-Id"] = profile.id
+        return response
+    finally:
+        sampler.stopped.set()
+        _current_profile.reset(token)
+        profile.finish(status_code)
+        _profiles.append(profile)
+
+
+def recent_profiles() -> List[dict]:
+    return [profile.summary() for profile in reversed(_profiles)]
+
+
+def get_profile(profile_id: str) -> RequestProfile:
+    for profile in _profiles:
+        if profile.id == profile_id:
+            return profile
+    raise HTTPException(status_code=404, detail="Profile not found")
+
+
+async def require_profile_token(x_profile_token: Optional[str] = Header(None)) -> None:
+    """Dependency guarding the profile admin endpoints"""
+    if not PROFILE_TOKEN:
+        raise HTTPException(status_code=404, detail="Profiling is disabled")
+    if not x_profile_token or not secrets.compare_digest(x_profile_token, PROFILE_TOKEN):
+        raise HTTPException(status_code=403, detail="Invalid profile token")
@@ -0,0 +1,217 @@
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from models.task import TaskReminder
+from utils.partition_router import PartitionRouter
+from typing import Dict, List, Optional, Set, Tuple
+from datetime import datetime, timezone, timedelta
+from abc import ABC, abstractmethod
+import asyncio
+import heapq
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class ReminderSink(ABC):
+    """Destination for fired reminders (email, push, queue...)"""
+
+    @abstractmethod
+    async def send(self, reminder: TaskReminder) -> None:
+        ...
+
+
+class LoggingReminderSink(ReminderSink):
+    """Local stand-in sink that just logs each reminder"""
+
+    async def send(self, reminder: TaskReminder) -> None:
+        logger.info("Reminder for user %s: task %s '%s' is due %s",
+                    reminder.user_id, reminder.task_id, reminder.title, reminder.due_date)
+
+
+def _parse_due_date(due_date: Optional[str]) -> Optional[datetime]:
+    """Parse a stored due date; date-only and naive values are taken as UTC"""
+    if not due_date:
+        return None
+    try:
+        parsed = datetime.fromisoformat(due_date.replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+class ReminderScheduler:
+    """Fires a reminder for each incomplete task when its due date (minus a lead time) arrives.
+
+    Only tasks firing before `_loaded_until` are held in memory, in a min-heap
+    keyed by fire time. The horizon is advanced one window at a time with an
+    indexed `due_date` range query, and the TaskController write paths keep
+    held tasks current through track()/forget(). Superseded heap entries are
+    skipped lazily, so every update is O(log n). A task whose fire time has
+    passed but which is not yet due is reminded about straight away.
+    """
+
+    def __init__(
+        self,
+        db: AsyncIOMotorDatabase,
+        sink: Optional[ReminderSink] = None,
+        lead_time: timedelta = timedelta(0),
+        window: timedelta = timedelta(hours=6),
+        partition_router: Optional[PartitionRouter] = None
+    ):
+        self.databases = partition_router.partitions if partition_router else [db]
+        self.sink = sink or LoggingReminderSink()
+        self.lead_time = lead_time
+        self.window = window.total_seconds()
+
+        self._heap: List[Tuple[float, str]] = []
+        self._entries: Dict[str, Tuple[float, dict]] = {}
+        # Fire times already sent, so later edits to a not-yet-due task do not repeat them
+        self._fired: Dict[str, float] = {}
+        # Ids forgotten while a window is loading; the load must not re-add them from stale reads
+        self._forgotten_during_load: Optional[Set[str]] = None
+        self._loaded_until = 0.0
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+        self.fired = 0
+        self.send_errors = 0
+
+    async def ensure_indexes(self) -> None:
+        for database in self.databases:
+            await database.tasks.create_index([("completed", 1), ("due_date", 1)])
+
+    def _fire_time(self, due_date: Optional[str]) -> Optional[float]:
+        parsed = _parse_due_date(due_date)
+        return (parsed - self.lead_time).timestamp() if parsed else None
+
+    def track(self, task: dict) -> None:
+        """Add, move or drop a task's reminder after a write"""
+        fire_at = None if task.get("completed") else self._fire_time(task.get("due_date"))
+
+        current = self._entries.get(task["id"])
+
+        # Tasks beyond the horizon are picked up when their window is loaded; tasks
+        # already due, or already reminded about at this fire time, are dropped
+        if (
+            fire_at is None
+            or fire_at >= self._loaded_until
+            or fire_at + self.lead_time.total_seconds() <= time.time()
+            or self._fired.get(task["id"]) == fire_at
+        ):
+            self.forget(task["id"])
+            return
+
+        self._entries[task["id"]] = (fire_at, {
+            "task_id": task["id"],
+            "user_id": task["user_id"],
+            "title": task["title"],
+            "due_date": task["due_date"],
+        })
+        if current is None or current[0] != fire_at:
+            heapq.heappush(self._heap, (fire_at, task["id"]))
+            if self._heap[0][1] == task["id"]:
+                self._wakeup.set()
+
+    def forget(self, task_id: str) -> None:
+        """Drop a task's reminder; its heap entry is discarded when it surfaces"""
+        if self._forgotten_during_load is not None:
+            self._forgotten_during_load.add(task_id)
+        if self._entries.pop(task_id, None) is not None:
+            # Rebuild once stale entries dominate so the heap stays O(pending)
+            if len(self._heap) > 2 * len(self._entries) + 1024:
+                self._heap = [(fire_at, entry_id) for entry_id, (fire_at, _) in self._entries.items()]
+                heapq.heapify(self._heap)
+
+    async def _load_window(self) -> None:
+        """Advance the horizon by one window, loading tasks that fall due inside it"""
+        now = time.time()
+        lead = self.lead_time.total_seconds()
+        end = max(self._loaded_until, now) + self.window
+        # The first load also picks up tasks whose fire time has passed but that are not yet due
+        start = self._loaded_until or now - lead
+
+        # Stored due dates are ISO strings of varying precision, so query a slightly
+        # wider string range and filter on the parsed fire time
+        low = datetime.fromtimestamp(start + lead, timezone.utc) - timedelta(days=1)
+        high = datetime.fromtimestamp(end + lead, timezone.utc) + timedelta(days=1)
+        query = {"completed": False, "due_date": {"$gte": low.date().isoformat(), "$lt": high.isoformat()}}
+        projection = {"_id": 0, "id": 1, "user_id": 1, "title": 1, "due_date": 1}
+
+        self._fired = {task_id: fire_at for task_id, fire_at in self._fired.items() if fire_at + lead > now}
+        self._loaded_until = end
+        self._forgotten_during_load = set()
+        loaded = 0
+        try:
+            for database in self.databases:
+                async for task in database.tasks.find(query, projection):
+                    if task["id"] in self._entries or task["id"] in self._forgotten_during_load:
+                        continue
+                    fire_at = self._fire_time(task.get("due_date"))
+                    if fire_at is not None and start <= fire_at < end:
+                        self.track(task)
+                        loaded += task["id"] in self._entries
+        finally:
+            self._forgotten_during_load = None
+        logger.debug("Loaded %d reminders up to %s", loaded, datetime.fromtimestamp(end, timezone.utc).isoformat())
+
+    async def _fire_due(self) -> None:
+        now = time.time()
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            fire_at, task_id = heapq.heappop(self._heap)
+            current = self._entries.get(task_id)
+            if current is None or current[0] != fire_at:
+                continue  # superseded or forgotten
+            del self._entries[task_id]
+            self._fired[task_id] = fire_at
+            due.append(TaskReminder(**current[1], fired_at=datetime.now(timezone.utc).isoformat()))
+
+        results = await asyncio.gather(*(self.sink.send(reminder) for reminder in due), return_exceptions=True)
+        for result in results:
+            if isinstance(result, Exception):
+                self.send_errors += 1
+                logger.error("Failed to send reminder: %s", result)
+            else:
+                self.fired += 1
+
+    async def _run_forever(self) -> None:
+        await self.ensure_indexes()
+        while True:
+            self._wakeup.clear()
+            try:
+                # Load the next window once half of the current one has elapsed
+                if time.time() >= self._loaded_until - self.window / 2:
+                    await self._load_window()
+                await self._fire_due()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Reminder scheduler iteration failed")
+
+            next_fire = self._heap[0][0] if self._heap else float("inf")
+            timeout = max(0.0, min(next_fire, self._loaded_until - self.window / 2) - time.time())
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run_forever())
+
+    async def stop(self) -> None:
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    def metrics(self) -> dict:
+        return {
+            "pending": len(self._entries),
+            "heap_size": len(self._heap),
+            "loaded_until": datetime.fromtimestamp(self._loaded_until, timezone.utc).isoformat() if self._loaded_until else None,
+            "fired": self.fired,
+            "send_errors": self.send_errors,
+        }
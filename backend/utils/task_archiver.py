@@ -0,0 +1,142 @@
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ReplaceOne
+from typing import Optional
+from utils.partition_router import PartitionRouter
+from utils.write_coalescer import WriteCoalescer
+from datetime import datetime, timezone, timedelta
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class TaskArchiver:
+    """Background job that moves long-completed tasks into `tasks_archive`.
+
+    A task is eligible once it is completed and its `updated_at` is older than
+    `archive_after_days`. Each batch is copied with idempotent upserts before it
+    is deleted from `tasks`, so an interrupted run is simply resumed by the next.
+    With a partition router, every partition database is archived in turn.
+    Tasks with updates still buffered in the write coalescer are left live, since
+    the buffered update would otherwise land on a task that is no longer there.
+    """
+
+    def __init__(
+        self,
+        db: AsyncIOMotorDatabase,
+        archive_after_days: int = 30,
+        batch_size: int = 500,
+        batch_interval: float = 1.0,
+        run_interval: float = 3600,
+        partition_router: Optional[PartitionRouter] = None,
+        write_coalescer: Optional[WriteCoalescer] = None
+    ):
+        self.databases = partition_router.partitions if partition_router else [db]
+        self.write_coalescer = write_coalescer
+        self.archive_after_days = archive_after_days
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval
+        self.run_interval = run_interval
+        self._task: Optional[asyncio.Task] = None
+
+        self.total_moved = 0
+        self.skipped_pending = 0
+        self.last_run_moved = 0
+        self.last_run_at: Optional[str] = None
+
+    async def ensure_indexes(self) -> None:
+        for database in self.databases:
+            await database.tasks.create_index([("completed", 1), ("updated_at", 1)])
+            await database.tasks_archive.create_index("id", unique=True)
+            await database.tasks_archive.create_index("user_id")
+
+    def _has_pending_write(self, task: dict) -> bool:
+        return bool(self.write_coalescer and self.write_coalescer.pending_for(task["id"], task["user_id"]))
+
+    async def archive_batch(self, db: AsyncIOMotorDatabase, cutoff: str) -> int:
+        """Move one batch of eligible tasks in a database, returning how many were moved"""
+        eligible = {"completed": True, "updated_at": {"$lt": cutoff}}
+        found = await db.tasks.find(eligible).sort("updated_at", 1).limit(self.batch_size).to_list(length=None)
+        tasks = [task for task in found if not self._has_pending_write(task)]
+        self.skipped_pending += len(found) - len(tasks)
+        if not tasks:
+            return 0
+
+        await db.tasks_archive.bulk_write(
+            [ReplaceOne({"id": task["id"]}, task, upsert=True) for task in tasks],
+            ordered=False
+        )
+
+        # Delete one by one so we know exactly which live documents this batch removed
+        deleted = await asyncio.gather(*(
+            db.tasks.find_one_and_delete({"id": task["id"], **eligible})
+            for task in tasks
+        ))
+
+        # An update buffered while the task was being deleted needs the live task back
+        for task, result in zip(tasks, deleted):
+            if result is not None and self._has_pending_write(task):
+                await db.tasks.replace_one({"id": task["id"]}, result, upsert=True)
+                self.skipped_pending += 1
+        not_moved = [
+            task["id"] for task, result in zip(tasks, deleted)
+            if result is None or self._has_pending_write(task)
+        ]
+
+        # Tasks edited or reopened since they were read stay live, and tasks the user
+        # deleted meanwhile are gone - either way the archive copy must not survive
+        if not_moved:
+            await db.tasks_archive.delete_many({"id": {"$in": not_moved}})
+
+        return len(tasks) - len(not_moved)
+
+    async def run_once(self) -> int:
+        """Archive everything currently eligible, pausing between batches"""
+        cutoff = (datetime.now(timezone.utc) - timedelta(days=self.archive_after_days)).isoformat()
+        moved = 0
+
+        for database in self.databases:
+            while True:
+                batch_moved = await self.archive_batch(database, cutoff)
+                moved += batch_moved
+                if batch_moved < self.batch_size:
+                    break
+                await asyncio.sleep(self.batch_interval)
+
+        self.total_moved += moved
+        self.last_run_moved = moved
+        self.last_run_at = datetime.now(timezone.utc).isoformat()
+        logger.info("Archived %d completed tasks older than %d days", moved, self.archive_after_days)
+        return moved
+
+    async def _run_forever(self) -> None:
+        await self.ensure_indexes()
+        while True:
+            try:
+                await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Task archiver run failed")
+            await asyncio.sleep(self.run_interval)
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run_forever())
+
+    async def stop(self) -> None:
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    def metrics(self) -> dict:
+        return {
+            "archive_after_days": self.archive_after_days,
+            "total_moved": self.total_moved,
+            "skipped_pending": self.skipped_pending,
+            "last_run_moved": self.last_run_moved,
+            "last_run_at": self.last_run_at,
+        }
@@ -0,0 +1,156 @@
+from motor.motor_asyncio import AsyncIOMotorCollection
+from pymongo import UpdateOne
+from typing import Dict, List, Optional, Tuple
+from utils.partition_router import PartitionRouter
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class WriteCoalescer:
+    """Write-behind buffer that merges $set updates to the same task.
+
+    Updates scheduled within `window_ms` of the first pending write are merged
+    per (task_id, user_id) and flushed together as one unordered bulk_write
+    per partition.
+    """
+
+    def __init__(
+        self,
+        collection: AsyncIOMotorCollection,
+        window_ms: int = 50,
+        partition_router: Optional[PartitionRouter] = None
+    ):
+        self.collection = collection
+        self.partition_router = partition_router
+        self.window = window_ms / 1000
+        self._pending: Dict[Tuple[str, str], dict] = {}
+        # Batch currently being written; still visible to readers until it lands
+        self._inflight: Dict[Tuple[str, str], dict] = {}
+        self._flush_handle: Optional[asyncio.Task] = None
+        self._flush_lock = asyncio.Lock()
+
+        # Metrics
+        self.writes_received = 0
+        self.writes_flushed = 0
+        self.flushes = 0
+        self.flush_errors = 0
+        self.writes_lost = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self._total_flush_ms = 0.0
+
+    def schedule(self, task_id: str, user_id: str, fields: dict) -> None:
+        """Queue a $set for a task, merging with any pending update"""
+        key = (task_id, user_id)
+        self._pending.setdefault(key, {}).update(fields)
+        self.writes_received += 1
+        self._arm_timer()
+
+    def _arm_timer(self) -> None:
+        # The running timer counts only while it is still waiting out its window;
+        # once it is flushing, whatever arrives next needs a timer of its own
+        if (
+            self._flush_handle is None
+            or self._flush_handle.done()
+            or self._flush_handle is asyncio.current_task()
+        ):
+            self._flush_handle = asyncio.create_task(self._flush_after_window())
+
+    def pending_for(self, task_id: str, user_id: str) -> Optional[dict]:
+        """Return the fields for a task that are not yet durable, if any"""
+        key = (task_id, user_id)
+        pending = {**self._inflight.get(key, {}), **self._pending.get(key, {})}
+        return pending or None
+
+    def has_pending_for_user(self, user_id: str) -> bool:
+        return any(key[1] == user_id for key in self._pending) or any(key[1] == user_id for key in self._inflight)
+
+    def discard(self, task_id: str, user_id: str) -> None:
+        """Drop pending writes for a task (e.g. when it is deleted)"""
+        self._pending.pop((task_id, user_id), None)
+        self._inflight.pop((task_id, user_id), None)
+
+    async def _flush_after_window(self) -> None:
+        await asyncio.sleep(self.window)
+        await self.flush()
+
+    async def flush(self) -> None:
+        """Write all pending updates with one bulk_write per partition"""
+        async with self._flush_lock:
+            if not self._pending:
+                return
+
+            batch, self._pending = self._pending, {}
+            self._inflight = batch
+            groups: Dict[int, Tuple[AsyncIOMotorCollection, List[UpdateOne]]] = {}
+            for (task_id, user_id), fields in batch.items():
+                partition, collection = self._route(user_id)
+                groups.setdefault(partition, (collection, []))[1].append(
+                    UpdateOne({"id": task_id, "user_id": user_id}, {"$set": fields})
+                )
+
+            start = time.perf_counter()
+            try:
+                for collection, operations in groups.values():
+                    result = await collection.bulk_write(operations, ordered=False)
+                    # The task was deleted (or archived) before its buffered update landed
+                    lost = len(operations) - result.matched_count
+                    if lost:
+                        self.writes_lost += lost
+                        logger.warning("%d coalesced task writes matched no task", lost)
+            except Exception:
+                # Put the batch back underneath anything written since, newer fields win.
+                # Re-applying groups that did succeed is harmless since $set is idempotent.
+                self.flush_errors += 1
+                for key, fields in self._inflight.items():
+                    self._pending[key] = {**fields, **self._pending.get(key, {})}
+                logger.exception("Failed to flush %d coalesced task writes", len(batch))
+                self._arm_timer()
+                return
+            finally:
+                self._inflight = {}
+                elapsed_ms = (time.perf_counter() - start) * 1000
+                self.last_flush_ms = elapsed_ms
+                self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+                self._total_flush_ms += elapsed_ms
+                self.flushes += 1
+
+            self.writes_flushed += len(batch)
+            if self._pending:
+                self._arm_timer()
+
+    def _route(self, user_id: str) -> Tuple[int, AsyncIOMotorCollection]:
+        if self.partition_router:
+            partition = self.partition_router.partition_for(user_id)
+            return partition, self.partition_router.partitions[partition].tasks
+        return 0, self.collection
+
+    async def close(self) -> None:
+        """Flush everything that is buffered and stop the pending timer"""
+        await self.flush()
+        if self._flush_handle is not None and not self._flush_handle.done():
+            self._flush_handle.cancel()
+        if self._pending:
+            # The final flush failed and there is no retry left to run
+            logger.error(
+                "Dropping %d coalesced task writes that could not be flushed at shutdown: %s",
+                len(self._pending), dict(self._pending)
+            )
+            self._pending = {}
+
+    def metrics(self) -> dict:
+        return {
+            "writes_received": self.writes_received,
+            "writes_flushed": self.writes_flushed,
+            "pending": len(self._pending),
+            "flushes": self.flushes,
+            "flush_errors": self.flush_errors,
+            "writes_lost": self.writes_lost,
+            "merge_ratio": round(self.writes_received / self.writes_flushed, 3) if self.writes_flushed else None,
+            "last_flush_ms": round(self.last_flush_ms, 3),
+            "avg_flush_ms": round(self._total_flush_ms / self.flushes, 3) if self.flushes else None,
+            "max_flush_ms": round(self.max_flush_ms, 3),
+        }
@@ -0,0 +1,84 @@
+import sys
+import time
+import uuid
+import random
+from pathlib import Path
+from datetime import datetime, timezone, timedelta
+
+sys.path.insert(0, str(Path(__file__).parent / "backend"))
+
+from utils.encoding import (
+    JSON_MEDIA_TYPE,
+    MSGPACK_MEDIA_TYPE,
+    ENCODING_PREFERENCE,
+    msgpack,
+    serialize,
+    compress,
+)
+
+LIST_SIZES = [10, 100, 1000, 10000]
+REPEATS = 20
+
+CATEGORIES = ["Work", "Personal", "Shopping", "Health", None]
+TAGS = ["urgent", "home", "office", "errands", "later", "review"]
+WORDS = "plan review send call write fix update prepare check book order clean".split()
+
+
+def make_tasks(count):
+    """Generate task documents shaped like get_all_tasks output"""
+    user_id = str(uuid.uuid4())
+    now = datetime.now(timezone.utc)
+    tasks = []
+    for i in range(count):
+        created = now - timedelta(minutes=random.randint(0, 60 * 24 * 90))
+        tasks.append({
+            "id": str(uuid.uuid4()),
+            "user_id": user_id,
+            "title": " ".join(random.choices(WORDS, k=random.randint(2, 6))).capitalize(),
+            "description": " ".join(random.choices(WORDS, k=random.randint(0, 25))) or None,
+            "completed": random.random() < 0.4,
+            "priority": random.choice(["High", "Medium", "Low"]),
+            "due_date": (created + timedelta(days=random.randint(1, 30))).isoformat() if random.random() < 0.6 else None,
+            "category": random.choice(CATEGORIES),
+            "tags": random.sample(TAGS, k=random.randint(0, 3)),
+            "created_at": created.isoformat(),
+            "updated_at": created.isoformat(),
+        })
+    return tasks
+
+
+def timed(fn):
+    """Return (result, mean CPU milliseconds) over REPEATS runs"""
+    start = time.process_time()
+    for _ in range(REPEATS):
+        result = fn()
+    return result, (time.process_time() - start) * 1000 / REPEATS
+
+
+def main():
+    media_types = [JSON_MEDIA_TYPE] + ([MSGPACK_MEDIA_TYPE] if msgpack is not None else [])
+    encodings = [None] + ENCODING_PREFERENCE
+
+    print(f"{'tasks':>6} {'format':<22} {'encoding':<9} {'bytes':>10} {'ratio':>7} {'cpu ms':>8}")
+    for size in LIST_SIZES:
+        tasks = make_tasks(size)
+        baseline = None
+        for media_type in media_types:
+            body, serialize_ms = timed(lambda: serialize(tasks, media_type))
+            if baseline is None:
+                baseline = len(body)
+            for encoding in encodings:
+                if encoding is None:
+                    payload, cpu_ms = body, serialize_ms
+                else:
+                    payload, compress_ms = timed(lambda: compress(body, encoding))
+                    cpu_ms = serialize_ms + compress_ms
+                print(
+                    f"{size:>6} {media_type:<22} {encoding or 'identity':<9} "
+                    f"{len(payload):>10} {len(payload) / baseline:>7.2%} {cpu_ms:>8.2f}"
+                )
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,11 @@
-import React, { createContext, useState, useContext, useEffect } from 'react';
+import React, { createContext, useState, useContext, useEffect, useRef } from 'react';
 import axios from 'axios';
 
 const AuthContext = createContext(null);
 
+const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
+const API = `${BACKEND_URL}/api`;
+
 export const useAuth = () => {
   const context = useContext(AuthContext);
   if (!context) {
@@ -15,6 +18,7 @@ export const AuthProvider = ({ children }) => {
   const [user, setUser] = useState(null);
   const [token, setToken] = useState(localStorage.getItem('token'));
   const [loading, setLoading] = useState(true);
+  const refreshPromise = useRef(null);
 
   useEffect(() => {
     const storedUser = localStorage.getItem('user');
@@ -27,20 +31,79 @@ export const AuthProvider = ({ children }) => {
     setLoading(false);
   }, []);
 
-  const login = (userData, authToken) => {
+  const login = (userData, authToken, refreshToken) => {
     setUser(userData);
     setToken(authToken);
     localStorage.setItem('user', JSON.stringify(userData));
     localStorage.setItem('token', authToken);
+    localStorage.setItem('refreshToken', refreshToken);
   };
 
-  const logout = () => {
+  const clearSession = () => {
     setUser(null);
     setToken(null);
     localStorage.removeItem('user');
     localStorage.removeItem('token');
+    localStorage.removeItem('refreshToken');
   };
 
+  const logout = () => {
+    // Log out with the refresh token: the access token has often expired by now
+    const refreshToken = localStorage.getItem('refreshToken');
+    if (refreshToken) {
+      axios.post(`${API}/auth/logout`, { refresh_token: refreshToken }).catch(() => {});
+    }
+    clearSession();
+  };
+
+  // Access tokens are short-lived: on a 401, redeem the refresh token once and retry
+  useEffect(() => {
+    const refreshAccessToken = async () => {
+      const refreshToken = localStorage.getItem('refreshToken');
+      if (!refreshToken) throw new Error('No refresh token');
+
+      const response = await axios.post(`${API}/auth/refresh`, { refresh_token: refreshToken });
+      localStorage.setItem('token', response.data.access_token);
+      // No refresh token comes back when another tab redeemed ours first; it already stored the new one
+      if (response.data.refresh_token) {
+        localStorage.setItem('refreshToken', response.data.refresh_token);
+      }
+      setToken(response.data.access_token);
+      return response.data.access_token;
+    };
+
+    const interceptor = axios.interceptors.response.use(
+      (response) => response,
+      async (error) => {
+        const request = error.config;
+        if (
+          error.response?.status !== 401 ||
+          !request ||
+          request._retried ||
+          request.url?.includes('/auth/')
+        ) {
+          return Promise.reject(error);
+        }
+
+        request._retried = true;
+        try {
+          // Share one refresh between requests that fail together
+          refreshPromise.current = refreshPromise.current || refreshAccessToken();
+          const newToken = await refreshPromise.current;
+          request.headers.Authorization = `Bearer ${newToken}`;
+          return axios(request);
+        } catch (refreshError) {
+          clearSession();
+          return Promise.reject(error);
+        } finally {
+          refreshPromise.current = null;
+        }
+      }
+    );
+
+    return () => axios.interceptors.response.eject(interceptor);
+  }, []);
+
   const value = {
     user,
     token,
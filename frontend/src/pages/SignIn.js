@@ -30,7 +30,7 @@ const SignIn = () => {
 
     try {
       const response = await axios.post(`${API}/auth/signin`, formData);
-      login(response.data.user, response.data.access_token);
+      login(response.data.user, response.data.access_token, response.data.refresh_token);
       toast.success('Welcome back!');
       navigate('/dashboard');
     } catch (error) {
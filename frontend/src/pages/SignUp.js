@@ -31,7 +31,7 @@ const SignUp = () => {
 
     try {
       const response = await axios.post(`${API}/auth/signup`, formData);
-      login(response.data.user, response.data.access_token);
+      login(response.data.user, response.data.access_token, response.data.refresh_token);
       toast.success('Account created successfully!');
       navigate('/dashboard');
     } catch (error) {
@@ -0,0 +1,100 @@
+import asyncio
+import logging
+
+from pymongo.errors import OperationFailure
+
+from utils.activity_log import ActivityLog
+
+
+class FakeEvents:
+    """Stands in for the task_events collection; inserts can be held open"""
+
+    name = "task_events"
+
+    def __init__(self):
+        self.database = self
+        self.batches = []
+        self.commands = []
+        self.indexes = []
+        self.gate = None
+        self.ttl_conflict = False
+
+    async def insert_many(self, batch, ordered=True):
+        if self.gate is not None:
+            await self.gate.wait()
+        self.batches.append(batch)
+
+    async def create_index(self, keys, **options):
+        if self.ttl_conflict and "expireAfterSeconds" in options:
+            raise OperationFailure("IndexOptionsConflict", code=85)
+        self.indexes.append((keys, options))
+
+    async def command(self, *args, **kwargs):
+        self.commands.append((args, kwargs))
+
+
+class FakeDatabase:
+    def __init__(self):
+        self.task_events = FakeEvents()
+
+
+def test_events_are_written_in_batches():
+    async def scenario():
+        db = FakeDatabase()
+        log = ActivityLog(db, batch_size=3, flush_interval=0.05)
+        log.start()
+        for index in range(7):
+            log.record("updated", f"t{index}", "u1")
+        await log.stop()
+        return db.task_events.batches, log.metrics()
+
+    batches, metrics = asyncio.run(scenario())
+    assert [len(batch) for batch in batches] == [3, 3, 1]
+    assert metrics["written"] == 7
+    assert metrics["queued"] == 0
+
+
+def test_full_queue_drops_events_instead_of_blocking():
+    async def scenario():
+        db = FakeDatabase()
+        log = ActivityLog(db, max_queue=2)
+        for index in range(5):
+            log.record("updated", f"t{index}", "u1")
+        return log.metrics()
+
+    metrics = asyncio.run(scenario())
+    assert (metrics["recorded"], metrics["dropped"], metrics["queued"]) == (2, 3, 2)
+
+
+def test_stop_gives_up_after_timeout_and_counts_lost_events(caplog):
+    async def scenario():
+        db = FakeDatabase()
+        db.task_events.gate = asyncio.Event()  # the database never answers
+        log = ActivityLog(db, batch_size=2, flush_interval=0.01)
+        log.start()
+        log.record("updated", "t1", "u1")
+        log.record("updated", "t2", "u1")
+        await asyncio.sleep(0.05)  # first batch is now stuck in insert_many
+        log.record("updated", "t3", "u1")
+        await log.stop(timeout=0.1)
+        return log
+
+    with caplog.at_level(logging.ERROR, logger="utils.activity_log"):
+        log = asyncio.run(scenario())
+    assert log._task.done()
+    assert log.metrics()["dropped"] == 3
+    assert log.metrics()["written"] == 0
+    assert "dropping 3 queued events" in caplog.text
+
+
+def test_changed_retention_updates_the_ttl_index_in_place():
+    async def scenario():
+        db = FakeDatabase()
+        db.task_events.ttl_conflict = True
+        await ActivityLog(db, retention_days=7).ensure_indexes()
+        return db.task_events.commands
+
+    assert asyncio.run(scenario()) == [(
+        ("collMod", "task_events"),
+        {"index": {"keyPattern": {"created_at": 1}, "expireAfterSeconds": 7 * 24 * 3600}},
+    )]
@@ -0,0 +1,91 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import HTTPException
+
+from controllers.auth_controller import AuthController
+from utils import auth
+from utils.auth import decode_token, is_session_revoked, revoke_session
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+
+def new_controller():
+    return AuthController(mongomock_motor.AsyncMongoMockClient()["auth"])
+
+
+def test_refresh_rotates_the_token():
+    async def scenario():
+        controller = new_controller()
+        tokens = await controller._create_session("u1", "a@example.com")
+        rotated = await controller.refresh(tokens["refresh_token"])
+        again = await controller.refresh(rotated["refresh_token"])
+        return tokens, rotated, again
+
+    tokens, rotated, again = asyncio.run(scenario())
+    assert rotated["refresh_token"] not in (None, tokens["refresh_token"])
+    assert again["refresh_token"] not in (None, rotated["refresh_token"])
+    payload = decode_token(again["access_token"])
+    assert payload["user_id"] == "u1"
+    assert payload["sid"] == decode_token(tokens["access_token"])["sid"]
+
+
+def test_racing_refresh_within_grace_gets_an_access_token_only():
+    async def scenario():
+        controller = new_controller()
+        tokens = await controller._create_session("u1", "a@example.com")
+        winner = await controller.refresh(tokens["refresh_token"])
+        loser = await controller.refresh(tokens["refresh_token"])
+        # The session survives: the winner's token still rotates
+        after = await controller.refresh(winner["refresh_token"])
+        return loser, after
+
+    loser, after = asyncio.run(scenario())
+    assert loser["refresh_token"] is None
+    assert decode_token(loser["access_token"])["user_id"] == "u1"
+    assert after["refresh_token"]
+    assert not is_session_revoked(decode_token(after["access_token"])["sid"])
+
+
+def test_reuse_after_grace_ends_the_session():
+    async def scenario():
+        controller = new_controller()
+        tokens = await controller._create_session("u1", "a@example.com")
+        rotated = await controller.refresh(tokens["refresh_token"])
+        await controller.sessions_collection.update_many(
+            {}, {"$set": {"rotated_at": datetime.now(timezone.utc) - timedelta(minutes=5)}}
+        )
+        with pytest.raises(HTTPException) as replay:
+            await controller.refresh(tokens["refresh_token"])
+        # The legitimate holder's token is dead too
+        with pytest.raises(HTTPException) as follow_up:
+            await controller.refresh(rotated["refresh_token"])
+        return tokens, replay.value, follow_up.value
+
+    tokens, replay, follow_up = asyncio.run(scenario())
+    assert replay.status_code == follow_up.status_code == 401
+    assert is_session_revoked(decode_token(tokens["access_token"])["sid"])
+
+
+def test_logout_with_refresh_token_ends_the_session():
+    async def scenario():
+        controller = new_controller()
+        tokens = await controller._create_session("u1", "a@example.com")
+        await controller.logout(tokens["refresh_token"])
+        with pytest.raises(HTTPException):
+            await controller.refresh(tokens["refresh_token"])
+        return tokens
+
+    tokens = asyncio.run(scenario())
+    assert is_session_revoked(decode_token(tokens["access_token"])["sid"])
+
+
+def test_revocation_expires_with_the_access_tokens(monkeypatch):
+    revoke_session("expiring")
+    assert is_session_revoked("expiring")
+
+    later = auth.time.time() + auth.ACCESS_TOKEN_EXPIRE_MINUTES * 60 + 1
+    monkeypatch.setattr(auth.time, "time", lambda: later)
+    assert not is_session_revoked("expiring")
+    assert "expiring" not in auth._revoked_sessions
@@ -0,0 +1,51 @@
+import gzip
+import json
+
+import pytest
+
+from utils import encoding
+from utils.encoding import (
+    JSON_MEDIA_TYPE,
+    MSGPACK_MEDIA_TYPE,
+    choose_encoding,
+    choose_media_type,
+    compress,
+    compress_stream,
+    serialize,
+)
+
+needs_msgpack = pytest.mark.skipif(encoding.msgpack is None, reason="msgpack not installed")
+
+
+def test_json_is_default():
+    assert choose_media_type(None) == JSON_MEDIA_TYPE
+    assert choose_media_type("*/*") == JSON_MEDIA_TYPE
+
+
+@needs_msgpack
+def test_msgpack_only_when_strictly_preferred():
+    assert choose_media_type("application/msgpack") == MSGPACK_MEDIA_TYPE
+    assert choose_media_type("application/json, application/msgpack") == JSON_MEDIA_TYPE
+    assert choose_media_type("application/msgpack, */*;q=0.5") == MSGPACK_MEDIA_TYPE
+    assert choose_media_type("application/msgpack;q=0.5, application/json") == JSON_MEDIA_TYPE
+
+
+def test_encoding_respects_q_values():
+    assert choose_encoding(None) is None
+    assert choose_encoding("identity") is None
+    assert choose_encoding("gzip") == "gzip"
+    assert choose_encoding("gzip;q=0") is None
+    assert choose_encoding("gzip;q=0.5, br;q=0, zstd;q=0") == "gzip"
+
+
+def test_encoding_prefers_server_order_on_ties():
+    assert choose_encoding("gzip, br, zstd") == encoding.ENCODING_PREFERENCE[0]
+    assert choose_encoding("*") == encoding.ENCODING_PREFERENCE[0]
+
+
+def test_gzip_stream_matches_one_shot():
+    body = serialize([{"title": f"task {i}", "tags": ["a", "b"]} for i in range(2000)], JSON_MEDIA_TYPE)
+    streamed = b"".join(compress_stream(body, "gzip", chunk_size=1024))
+    assert gzip.decompress(streamed) == body
+    assert gzip.decompress(compress(body, "gzip")) == body
+    assert json.loads(body)[1999]["title"] == "task 1999"
@@ -0,0 +1,132 @@
+import asyncio
+
+import pytest
+
+from utils.partition_router import PartitionRouter
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+
+def task(task_id, updated_at, title="t"):
+    return {"id": task_id, "user_id": "u1", "title": title, "completed": False, "updated_at": updated_at}
+
+
+def test_move_keeps_writes_made_on_the_target_during_the_move():
+    async def scenario():
+        client = mongomock_motor.AsyncMongoMockClient()
+        source_db, target_db = client["p0"], client["p1"]
+        router = PartitionRouter([source_db, target_db], client["meta"], refresh_interval=0.01)
+        await router.set_override("u1", 0)
+        for task_id in ("straggler", "edited", "deleted"):
+            await source_db.tasks.insert_one(task(task_id, "2000-01-01T00:00:00"))
+
+        set_override = router.set_override
+
+        async def flip_then_write(user_id, partition):
+            await set_override(user_id, partition)
+            # A request routed before the flip still lands on the source...
+            for task_id in ("straggler", "edited", "deleted"):
+                await source_db.tasks.update_one(
+                    {"id": task_id}, {"$set": {"title": "source", "updated_at": "9000-01-01T00:00:00"}}
+                )
+            # ...while newer requests already edit and delete on the target
+            await target_db.tasks.update_one(
+                {"id": "edited"}, {"$set": {"title": "target", "updated_at": "9999-01-01T00:00:00"}}
+            )
+            await target_db.tasks.delete_one({"id": "deleted"})
+
+        router.set_override = flip_then_write
+        result = await router.move_user("u1", 1)
+        titles = {doc["id"]: doc["title"] async for doc in target_db.tasks.find({})}
+        return result, titles, await source_db.tasks.count_documents({})
+
+    result, titles, left_on_source = asyncio.run(scenario())
+    assert result["moved"]["tasks"] == 3
+    assert titles == {"straggler": "source", "edited": "target"}
+    assert left_on_source == 0
+
+
+def test_adding_a_partition_keeps_existing_placement():
+    async def scenario():
+        client = mongomock_motor.AsyncMongoMockClient()
+        two = PartitionRouter([client["p0"], client["p1"]], client["meta"])
+        await two.load_placement()
+        three = PartitionRouter([client["p0"], client["p1"], client["p2"]], client["meta"])
+        await three.load_placement()
+        users = [f"user-{index}" for index in range(200)]
+        return [two.partition_for(user) for user in users], [three.partition_for(user) for user in users]
+
+    before, after = asyncio.run(scenario())
+    assert before == after
+    assert set(before) == {0, 1}
+
+
+def test_removing_a_partition_that_holds_users_is_refused():
+    async def scenario():
+        client = mongomock_motor.AsyncMongoMockClient()
+        await PartitionRouter([client["p0"], client["p1"]], client["meta"]).load_placement()
+        await PartitionRouter([client["p0"]], client["meta"]).load_placement()
+
+    with pytest.raises(ValueError):
+        asyncio.run(scenario())
+
+
+def test_main_database_keeps_existing_users_and_can_be_drained():
+    async def scenario():
+        client = mongomock_motor.AsyncMongoMockClient()
+        main_db = client["main"]
+        await main_db.tasks.insert_one(task("old", "2000-01-01T00:00:00"))
+
+        # Listing the main database as a partition keeps everyone where their tasks are
+        router = PartitionRouter([main_db, client["p1"]], main_db, refresh_interval=0.01)
+        await router.load_placement()
+        assert router.partition_for("u1") == 0
+
+        result = await router.move_bucket(router.bucket_for("u1"), 1)
+        return result, router.partition_for("u1"), await client["p1"].tasks.count_documents({}), \
+            await main_db.tasks.count_documents({}), await main_db.partition_overrides.count_documents({})
+
+    result, partition, on_target, on_main, overrides = asyncio.run(scenario())
+    assert result["users"] == 1
+    assert (partition, on_target, on_main) == (1, 1, 0)
+    assert overrides == 0
+
+
+def test_move_user_can_collect_tasks_from_a_named_source():
+    async def scenario():
+        client = mongomock_motor.AsyncMongoMockClient()
+        main_db = client["main"]
+        await main_db.tasks.insert_one(task("old", "2000-01-01T00:00:00"))
+        router = PartitionRouter([client["p0"], client["p1"]], main_db, refresh_interval=0.01)
+        await router.load_placement()
+        home = router.partition_for("u1")
+        await router.move_user("u1", home, source=main_db)
+        return await router.partitions[home].tasks.count_documents({"id": "old"}), await main_db.tasks.count_documents({})
+
+    assert asyncio.run(scenario()) == (1, 0)
+
+
+def test_move_keeps_tasks_archived_on_the_source_during_the_move():
+    async def scenario():
+        client = mongomock_motor.AsyncMongoMockClient()
+        source_db, target_db = client["p0"], client["p1"]
+        router = PartitionRouter([source_db, target_db], client["meta"], refresh_interval=0.01)
+        await router.set_override("u1", 0)
+        await source_db.tasks.insert_one({**task("done", "2000-01-01T00:00:00"), "completed": True})
+
+        set_override = router.set_override
+
+        async def flip_then_archive(user_id, partition):
+            await set_override(user_id, partition)
+            # The source's archiver moves the task without touching updated_at
+            document = await source_db.tasks.find_one_and_delete({"id": "done"})
+            await source_db.tasks_archive.insert_one(document)
+
+        router.set_override = flip_then_archive
+        await router.move_user("u1", 1)
+        return (
+            await target_db.tasks.count_documents({}),
+            await target_db.tasks_archive.count_documents({"id": "done"}),
+        )
+
+    assert asyncio.run(scenario()) == (0, 1)
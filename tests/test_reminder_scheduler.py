@@ -0,0 +1,150 @@
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from utils.reminder_scheduler import ReminderScheduler, ReminderSink
+
+
+class RecordingSink(ReminderSink):
+    def __init__(self):
+        self.sent = []
+
+    async def send(self, reminder):
+        self.sent.append(reminder)
+
+
+class FakeCursor:
+    """Async iterator over documents that can run a callback between them"""
+
+    def __init__(self, documents, on_next=None):
+        self.documents = list(documents)
+        self.on_next = on_next
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if not self.documents:
+            raise StopAsyncIteration
+        document = self.documents.pop(0)
+        if self.on_next:
+            self.on_next(document)
+        return document
+
+
+class FakeDatabase:
+    def __init__(self, documents, on_next=None):
+        self.tasks = self
+        self.documents = documents
+        self.on_next = on_next
+
+    def find(self, query, projection=None):
+        return FakeCursor(self.documents, self.on_next)
+
+
+def due_in(seconds):
+    return (datetime.now(timezone.utc) + timedelta(seconds=seconds)).isoformat()
+
+
+def task(task_id, due_date, completed=False):
+    return {"id": task_id, "user_id": "u1", "title": task_id, "due_date": due_date, "completed": completed}
+
+
+def make_scheduler(documents=(), lead_time=timedelta(0), on_next=None):
+    sink = RecordingSink()
+    scheduler = ReminderScheduler(FakeDatabase(list(documents), on_next), sink=sink, lead_time=lead_time)
+    return scheduler, sink
+
+
+def fire(scheduler):
+    asyncio.run(scheduler._fire_due())
+
+
+def test_rescheduling_supersedes_the_old_heap_entry():
+    scheduler, sink = make_scheduler(lead_time=timedelta(minutes=10))
+    scheduler._loaded_until = time.time() + 3600
+
+    scheduler.track(task("t1", due_in(1200)))
+    new_due_date = due_in(60)
+    scheduler.track(task("t1", new_due_date))
+    assert scheduler.metrics()["heap_size"] == 2
+    fire(scheduler)
+
+    assert [reminder.due_date for reminder in sink.sent] == [new_due_date]
+    assert scheduler.metrics()["pending"] == 0
+    # The stale entry stays in the heap and is skipped when it surfaces
+    assert [task_id for _, task_id in scheduler._heap] == ["t1"]
+
+
+def test_forget_and_complete_drop_the_reminder():
+    scheduler, sink = make_scheduler(lead_time=timedelta(minutes=10))
+    scheduler._loaded_until = time.time() + 3600
+
+    scheduler.track(task("t1", due_in(60)))
+    scheduler.track(task("t2", due_in(60)))
+    scheduler.forget("t1")
+    scheduler.track(task("t2", due_in(60), completed=True))
+    fire(scheduler)
+
+    assert sink.sent == []
+    assert scheduler.metrics()["pending"] == 0
+
+
+def test_heap_is_rebuilt_once_stale_entries_dominate():
+    scheduler, _ = make_scheduler()
+    scheduler._loaded_until = time.time() + 3600
+
+    for index in range(1100):
+        scheduler.track(task(f"t{index}", due_in(600)))
+    for index in range(1099):
+        scheduler.forget(f"t{index}")
+
+    assert len(scheduler._heap) < 1100
+    assert "t1099" in {task_id for _, task_id in scheduler._heap}
+
+
+def test_task_inside_lead_time_fires_immediately_once():
+    scheduler, sink = make_scheduler(lead_time=timedelta(minutes=10))
+    scheduler._loaded_until = time.time() + 3600
+
+    due_date = due_in(60)
+    scheduler.track(task("t1", due_date))
+    fire(scheduler)
+    assert [reminder.task_id for reminder in sink.sent] == ["t1"]
+
+    # Editing the task without moving its due date does not remind again
+    scheduler.track({**task("t1", due_date), "title": "renamed"})
+    fire(scheduler)
+    assert len(sink.sent) == 1
+
+
+def test_first_load_includes_tasks_inside_lead_time():
+    documents = [task("soon", due_in(60)), task("overdue", due_in(-60)), task("later", due_in(7200))]
+    scheduler, sink = make_scheduler(documents, lead_time=timedelta(minutes=10))
+
+    asyncio.run(scheduler._load_window())
+    fire(scheduler)
+
+    assert [reminder.task_id for reminder in sink.sent] == ["soon"]
+    assert set(scheduler._entries) == {"later"}
+
+
+def test_load_skips_tasks_forgotten_while_it_runs():
+    scheduler = None
+
+    def complete_second_task(document):
+        if document["id"] == "t1":
+            scheduler.forget("t2")  # t2 was completed while the cursor was open
+
+    documents = [task("t1", due_in(600)), task("t2", due_in(600))]
+    scheduler, _ = make_scheduler(documents, on_next=complete_second_task)
+    asyncio.run(scheduler._load_window())
+
+    assert set(scheduler._entries) == {"t1"}
+
+
+def test_sink_must_implement_send():
+    with pytest.raises(TypeError):
+        ReminderSink()
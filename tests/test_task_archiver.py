@@ -0,0 +1,111 @@
+import asyncio
+
+import pytest
+
+from utils.task_archiver import TaskArchiver
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+OLD = "2000-01-01T00:00:00+00:00"
+CUTOFF = "2020-01-01T00:00:00+00:00"
+
+
+def task(task_id, completed=True, updated_at=OLD):
+    return {"id": task_id, "user_id": "u1", "title": task_id, "completed": completed, "updated_at": updated_at}
+
+
+class StubCoalescer:
+    def __init__(self):
+        self.pending = set()
+
+    def pending_for(self, task_id, user_id):
+        return {"completed": False} if task_id in self.pending else None
+
+
+class RacingDatabase:
+    """Wraps a database so a callback runs right after the archiver reads its batch"""
+
+    def __init__(self, database, after_read):
+        self.tasks_archive = database.tasks_archive
+        self.tasks = _RacingTasks(database.tasks, after_read)
+
+
+class _RacingTasks:
+    def __init__(self, collection, after_read):
+        self.collection = collection
+        self.after_read = after_read
+
+    def __getattr__(self, name):
+        return getattr(self.collection, name)
+
+    def find(self, *args, **kwargs):
+        return _RacingCursor(self.collection.find(*args, **kwargs), self.after_read)
+
+
+class _RacingCursor:
+    def __init__(self, cursor, after_read):
+        self.cursor = cursor
+        self.after_read = after_read
+
+    def sort(self, *args):
+        self.cursor = self.cursor.sort(*args)
+        return self
+
+    def limit(self, *args):
+        self.cursor = self.cursor.limit(*args)
+        return self
+
+    async def to_list(self, length=None):
+        documents = await self.cursor.to_list(length)
+        await self.after_read()
+        return documents
+
+
+async def ids(collection):
+    return sorted(await collection.distinct("id"))
+
+
+def test_moves_only_old_completed_tasks():
+    async def scenario():
+        db = mongomock_motor.AsyncMongoMockClient()["archiver"]
+        await db.tasks.insert_many([
+            task("old"), task("open", completed=False), task("recent", updated_at="2030-01-01T00:00:00+00:00"),
+        ])
+        moved = await TaskArchiver(db).archive_batch(db, CUTOFF)
+        return moved, await ids(db.tasks), await ids(db.tasks_archive)
+
+    assert asyncio.run(scenario()) == (1, ["open", "recent"], ["old"])
+
+
+def test_tasks_changed_during_a_batch_leave_no_archive_copy():
+    async def scenario():
+        db = mongomock_motor.AsyncMongoMockClient()["archiver"]
+        await db.tasks.insert_many([task("kept"), task("reopened"), task("deleted")])
+
+        async def user_writes():
+            await db.tasks.update_one({"id": "reopened"}, {"$set": {"completed": False}})
+            await db.tasks.delete_one({"id": "deleted"})
+
+        moved = await TaskArchiver(db).archive_batch(RacingDatabase(db, user_writes), CUTOFF)
+        return moved, await ids(db.tasks), await ids(db.tasks_archive)
+
+    assert asyncio.run(scenario()) == (1, ["reopened"], ["kept"])
+
+
+def test_tasks_with_coalesced_writes_stay_live():
+    async def scenario():
+        db = mongomock_motor.AsyncMongoMockClient()["archiver"]
+        await db.tasks.insert_many([task("buffered"), task("late"), task("idle")])
+        coalescer = StubCoalescer()
+        coalescer.pending.add("buffered")
+
+        async def late_update():
+            coalescer.pending.add("late")  # buffered after the batch was read
+
+        archiver = TaskArchiver(db, write_coalescer=coalescer)
+        moved = await archiver.archive_batch(RacingDatabase(db, late_update), CUTOFF)
+        return moved, await ids(db.tasks), await ids(db.tasks_archive), archiver.metrics()["skipped_pending"]
+
+    moved, live, archived, skipped = asyncio.run(scenario())
+    assert (moved, live, archived) == (1, ["buffered", "late"], ["idle"])
+    assert skipped == 2
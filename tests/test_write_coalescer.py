@@ -0,0 +1,150 @@
+import asyncio
+import logging
+from types import SimpleNamespace
+
+from utils.write_coalescer import WriteCoalescer
+
+
+class FakeCollection:
+    """Records bulk_write calls; can be held open, made to fail, or miss some tasks"""
+
+    def __init__(self):
+        self.writes = []
+        self.gate = None
+        self.fail = 0
+        self.missing = set()
+
+    async def bulk_write(self, operations, ordered=True):
+        if self.gate is not None:
+            await self.gate.wait()
+        if self.fail:
+            self.fail -= 1
+            raise RuntimeError("write failed")
+        self.writes.append([(op._filter, op._doc) for op in operations])
+        matched = sum(1 for op in operations if op._filter["id"] not in self.missing)
+        return SimpleNamespace(matched_count=matched)
+
+
+def test_updates_to_same_task_are_merged():
+    async def scenario():
+        collection = FakeCollection()
+        coalescer = WriteCoalescer(collection, window_ms=10)
+        coalescer.schedule("t1", "u1", {"title": "a"})
+        coalescer.schedule("t1", "u1", {"title": "ab", "completed": True})
+        coalescer.schedule("t2", "u1", {"completed": False})
+        assert coalescer.pending_for("t1", "u1") == {"title": "ab", "completed": True}
+        await asyncio.sleep(0.05)
+        return collection, coalescer
+
+    collection, coalescer = asyncio.run(scenario())
+    assert collection.writes == [[
+        ({"id": "t1", "user_id": "u1"}, {"$set": {"title": "ab", "completed": True}}),
+        ({"id": "t2", "user_id": "u1"}, {"$set": {"completed": False}}),
+    ]]
+    metrics = coalescer.metrics()
+    assert metrics["writes_received"] == 3
+    assert metrics["writes_flushed"] == 2
+    assert metrics["merge_ratio"] == 1.5
+
+
+def test_inflight_batch_stays_visible_until_written():
+    async def scenario():
+        collection = FakeCollection()
+        collection.gate = asyncio.Event()
+        coalescer = WriteCoalescer(collection, window_ms=1000)
+        coalescer.schedule("t1", "u1", {"completed": True})
+
+        flushing = asyncio.create_task(coalescer.flush())
+        await asyncio.sleep(0)
+        assert coalescer.has_pending_for_user("u1")
+        assert coalescer.pending_for("t1", "u1") == {"completed": True}
+
+        # A reader waiting on flush() must not return before the write lands
+        reader = asyncio.create_task(coalescer.flush())
+        await asyncio.sleep(0.01)
+        assert not reader.done()
+
+        collection.gate.set()
+        await asyncio.gather(flushing, reader)
+        assert coalescer.pending_for("t1", "u1") is None
+        await coalescer.close()
+
+    asyncio.run(scenario())
+
+
+def test_failed_flush_is_retried_with_newer_fields_winning():
+    async def scenario():
+        collection = FakeCollection()
+        collection.fail = 1
+        coalescer = WriteCoalescer(collection, window_ms=10)
+        coalescer.schedule("t1", "u1", {"title": "old", "completed": True})
+        await coalescer.flush()
+        assert coalescer.metrics()["flush_errors"] == 1
+        coalescer.schedule("t1", "u1", {"title": "new"})
+        await asyncio.sleep(0.05)
+        return collection
+
+    collection = asyncio.run(scenario())
+    assert collection.writes == [[
+        ({"id": "t1", "user_id": "u1"}, {"$set": {"title": "new", "completed": True}}),
+    ]]
+
+
+def test_discard_drops_pending_fields():
+    async def scenario():
+        collection = FakeCollection()
+        coalescer = WriteCoalescer(collection, window_ms=10)
+        coalescer.schedule("t1", "u1", {"title": "a"})
+        coalescer.discard("t1", "u1")
+        await coalescer.close()
+        return collection
+
+    assert asyncio.run(scenario()).writes == []
+
+
+def test_close_reports_writes_it_could_not_flush(caplog):
+    async def scenario():
+        collection = FakeCollection()
+        collection.fail = 1
+        coalescer = WriteCoalescer(collection, window_ms=10)
+        coalescer.schedule("t1", "u1", {"title": "a"})
+        await coalescer.close()
+        return coalescer
+
+    with caplog.at_level(logging.ERROR, logger="utils.write_coalescer"):
+        coalescer = asyncio.run(scenario())
+    assert "Dropping 1 coalesced task writes" in caplog.text
+    assert coalescer.metrics()["pending"] == 0
+
+
+def test_write_scheduled_during_timer_flush_gets_its_own_timer():
+    async def scenario():
+        collection = FakeCollection()
+        collection.gate = asyncio.Event()
+        coalescer = WriteCoalescer(collection, window_ms=10)
+        coalescer.schedule("t1", "u1", {"title": "a"})
+        await asyncio.sleep(0.03)  # the timer's flush is now blocked in bulk_write
+
+        coalescer.schedule("t2", "u1", {"title": "b"})
+        collection.gate.set()
+        await asyncio.sleep(0.05)
+        return collection, coalescer
+
+    collection, coalescer = asyncio.run(scenario())
+    assert coalescer.metrics()["pending"] == 0
+    assert [len(write) for write in collection.writes] == [1, 1]
+
+
+def test_updates_that_match_no_task_are_counted_as_lost():
+    async def scenario():
+        collection = FakeCollection()
+        collection.missing = {"t1"}  # archived or deleted before the flush
+        coalescer = WriteCoalescer(collection, window_ms=10)
+        coalescer.schedule("t1", "u1", {"completed": False})
+        coalescer.schedule("t2", "u1", {"completed": False})
+        await coalescer.close()
+        return coalescer
+
+    metrics = asyncio.run(scenario()).metrics()
+    assert metrics["writes_lost"] == 1
+    assert metrics["writes_flushed"] == 2